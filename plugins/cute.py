@@ -130,10 +130,8 @@ async def toggle_cute(ctx):
     Toggles Cute Mode ON/OFF.
     Usage: .cute
     """
-    current_state = await ctx.engine.db.get("cute_mode_enabled", False)
-    new_state = not current_state
-    
-    await ctx.engine.db.set("cute_mode_enabled", new_state)
+    # Atomic toggle (single transaction instead of get + set)
+    new_state = await ctx.engine.db.update("cute_mode_enabled", lambda state: not state, default=False)
     
     # Using HTML tags now
     status = "✅ <b>Cute Mode Enabled!</b>" if new_state else "❌ <b>Cute Mode Disabled.</b>"
@@ -159,6 +157,8 @@ def register(engine):
 
         # 3. Process text
         try:
+            # A few ms even at Telegram's 4096-char limit: cheaper in-process than
+            # pickling it to engine.cpu (and importing this plugin in a worker)
             new_text = decorate_text(text)
             if new_text and new_text != text:
                 await asyncio.sleep(0.1) 
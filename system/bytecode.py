@@ -0,0 +1,95 @@
+import os
+import sys
+import marshal
+import hashlib
+import logging
+import importlib.util
+from types import CodeType
+from typing import Tuple
+
+logger = logging.getLogger("BytecodeCache")
+
+class BytecodeCache:
+    """
+    Compiled-code cache keyed by source SHA-256 (not mtime).
+    Freshly downloaded files with identical bytes hit the cache,
+    changed bytes always miss, whatever their timestamps say.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 256):
+        self.directory = directory
+        self.max_entries = max_entries
+        # cpython-311 etc.; the header check below guards against magic changes
+        self.tag = sys.implementation.cache_tag or "py"
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, digest: str, path: str) -> str:
+        # co_filename is baked into code objects, so the origin path is part of the key
+        origin = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.directory, f"{digest}-{origin}.{self.tag}.bin")
+
+    def load(self, path: str) -> Tuple[CodeType, str]:
+        """
+        Returns (code, source_sha256) for a file, compiling only on a cache miss.
+        """
+        with open(path, "rb") as f:
+            source = f.read()
+        digest = hashlib.sha256(source).hexdigest()
+        entry = self._entry_path(digest, path)
+
+        try:
+            with open(entry, "rb") as f:
+                data = f.read()
+            magic = importlib.util.MAGIC_NUMBER
+            if data[:len(magic)] == magic:
+                code = marshal.loads(data[len(magic):])
+                self.hits += 1
+                # mtime doubles as the LRU clock for prune()
+                os.utime(entry)
+                return code, digest
+        except (OSError, ValueError, EOFError, TypeError):
+            pass
+
+        self.misses += 1
+        code = compile(source, path, "exec", dont_inherit=True)
+        self._store(entry, code)
+        return code, digest
+
+    def _store(self, entry: str, code: CodeType):
+        """Atomic write (temp file + rename); failures only cost a recompile."""
+        tmp = f"{entry}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(importlib.util.MAGIC_NUMBER + marshal.dumps(code))
+            os.replace(tmp, entry)
+        except OSError as e:
+            logger.debug(f"Failed to write bytecode cache entry: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def prune(self) -> int:
+        """Drops the least recently used entries beyond max_entries."""
+        try:
+            entries = [
+                os.path.join(self.directory, f) for f in os.listdir(self.directory)
+                if f.endswith(".bin")
+            ]
+        except OSError:
+            return 0
+
+        if len(entries) <= self.max_entries:
+            return 0
+
+        entries.sort(key=lambda p: os.path.getmtime(p))
+        removed = 0
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry)
+                removed += 1
+            except OSError:
+                pass
+        return removed
@@ -9,9 +9,43 @@ class Config:
     # === DEFAULTS ===
     PREFIX = "."
     COMMAND_TIMEOUT = 240  # Seconds for execution
+    SUGGEST_COMMANDS = True  # Reply "did you mean" to unknown commands (own messages only)
+    SUGGEST_COOLDOWN = 10    # Seconds between suggestions in one chat
+    LOADER_WORKERS = 8     # Plugins executed concurrently at startup
+    LAZY_PLUGINS = True    # Import simple plugins on first command use
+    WATCH_PLUGINS = False  # Hot-reload plugins when files in PLUGINS_DIR change
+    CPU_WORKERS = 2        # Warm worker processes for ctx.run_cpu (0 = use a thread)
+    CPU_TASK_TIMEOUT = 30  # Seconds per CPU-bound job
+    REPO_SEARCH_CONCURRENCY = 8  # Repositories probed at once by .haruka install
+    REPO_INDEX_TTL = 300         # Seconds a cached repo index.json is used without revalidation
+
+    # --- HTTP CLIENT (engine.http) ---
+    HTTP_LIMIT = 32              # Open connections in total
+    HTTP_LIMIT_PER_HOST = 6      # Open connections per host
+    HTTP_DNS_TTL = 300           # Seconds DNS answers are cached
+    HTTP_KEEPALIVE = 30          # Seconds an idle connection is kept
+    HTTP_CONNECT_TIMEOUT = 5
+    HTTP_READ_TIMEOUT = 15       # Max gap between bytes while reading
+    HTTP_TOTAL_TIMEOUT = 60
+    HTTP_RETRIES = 2             # Extra attempts on 5xx/timeouts (GET/HEAD only)
+    MAX_PLUGIN_SIZE = 2 * 1024 * 1024  # Bytes; larger plugin downloads are aborted
+    STARTUP_TRACE = ""     # Path for a Chrome trace-event JSON of startup ("" = off)
     DB_FILE = "haruka_data.db"
+
+    # === DATABASE MAINTENANCE ===
+    EXPIRY_BATCH_SIZE = 500      # Rows deleted per batch
+    EXPIRY_MAX_BATCHES = 20      # Batches per maintenance tick
+    EXPIRY_MAX_SLEEP = 300       # Max seconds between expiry ticks
+    WAL_MAINTENANCE_INTERVAL = 3600  # Seconds between checkpoint + vacuum
+    BACKUP_INTERVAL = 0          # Seconds between scheduled backups (0 = disabled)
+    BACKUP_KEEP = 5              # Scheduled backups to keep
+    BACKUP_TIMEOUT = 600         # Seconds a scheduled backup may take before it is aborted
+    DB_SLOW_OP_THRESHOLD = 0.1   # Seconds; slower DB operations go to the slow log
+    DB_AUTO_VACUUM_MIGRATION = True  # One-time VACUUM of old DBs at startup (off = postpone)
     
     # === PATHS ===
     BASE_DIR = os.getcwd() # User's working directory
     SYSTEM_DIR = os.path.dirname(os.path.abspath(__file__))
-    PLUGINS_DIR = os.path.join(BASE_DIR, "plugins")
\ No newline at end of file
+    PLUGINS_DIR = os.path.join(BASE_DIR, "plugins")
+    BACKUP_DIR = os.path.join(BASE_DIR, "backups")
+    CACHE_DIR = os.path.join(BASE_DIR, ".haruka_cache")
\ No newline at end of file
@@ -37,6 +37,8 @@ class Context:
         self.raw_text: str = ""
         self.parts: List[str] = []
         self.trigger: str = ""
+        # CommandMeta resolved by the dispatcher (None outside command handlers)
+        self.command: Optional[Any] = None
         self.prefix: str = ""
         self.args: List[str] = []
         self.input: str = ""
@@ -90,6 +92,23 @@ class Context:
         self.args = self.parts[1:]
         self.valid = True
 
+    @property
+    def http(self):
+        """Shared HTTP client (engine.http): pooled, with retries and per-host metrics."""
+        return self.engine.http
+
+    def enter_subcommand(self, trigger: str):
+        """
+        Consumes the subcommand word after routing:
+        '.haruka install x' -> trigger 'haruka install', args ['x'], input 'x'.
+        """
+        rest = self.input.split(maxsplit=1)
+        self.input = rest[1] if len(rest) > 1 else ""
+        if len(self.parts) > 1:
+            self.parts = [f"{self.parts[0]} {self.parts[1]}"] + self.parts[2:]
+        self.args = self.parts[1:]
+        self.trigger = trigger
+
     def _detect_parse_mode(self, text: str) -> str:
         """Автоматичне визначення режиму парсингу."""
         if re.search(r"<[a-z][\s\S]*>", text):
@@ -238,15 +257,29 @@ class Context:
         """Помилка (червоний хрестик)."""
         # Тут ми явно вказуємо html, щоб заголовок був жирним
         # Але сам текст помилки екрануємо, щоб спецсимволи юзера не ламали верстку
-        await self.respond(f"<b>⛔ Error:</b> {self.escape(text)}", parse_mode='html')
+        return await self.respond(f"<b>⛔ Error:</b> {self.escape(text)}", parse_mode='html')
 
     async def ok(self, text: str):
         """Успіх (зелена галочка)."""
-        await self.respond(f"<b>✅ Success:</b> {self.escape(text)}", parse_mode='html')
+        return await self.respond(f"<b>✅ Success:</b> {self.escape(text)}", parse_mode='html')
         
     async def warn(self, text: str):
         """Попередження (жовтий трикутник)."""
-        await self.respond(f"<b>⚠️ Warning:</b> {self.escape(text)}", parse_mode='html')
+        return await self.respond(f"<b>⚠️ Warning:</b> {self.escape(text)}", parse_mode='html')
+
+    def create_task(self, coro, name: Optional[str] = None) -> asyncio.Task:
+        """
+        Фоновий таск модуля: скасовується при оновленні/видаленні плагіна.
+        На відміну від asyncio.create_task, відстежується навіть для чужих корутин.
+        """
+        return self.engine.create_task(coro, name=name)
+
+    async def run_cpu(self, fn, *args, timeout: Optional[float] = None) -> Any:
+        """
+        Виконує CPU-важку функцію в пулі процесів Engine, не блокуючи loop.
+        fn та аргументи мають бути picklable (функція рівня модуля).
+        """
+        return await self.engine.cpu.run(fn, *args, timeout=timeout)
 
     def __bool__(self):
         return self.valid
\ No newline at end of file
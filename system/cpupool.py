@@ -0,0 +1,137 @@
+import sys
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Set
+
+logger = logging.getLogger("CpuPool")
+
+def _init_worker(paths: List[str]):
+    """Makes 'system.*' and 'plugins.*' importable in the worker, whatever its cwd."""
+    for path in reversed(paths):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+def _warmup() -> bool:
+    """No-op submitted once per worker so processes exist before the first real job."""
+    return True
+
+def _terminate(pool: ProcessPoolExecutor):
+    """Stops a pool without waiting for running jobs: their worker processes are killed."""
+    # No public API for this before Python 3.14 (terminate_workers)
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(timeout=1)
+        if process.is_alive():
+            process.kill()
+
+class CpuPool:
+    """
+    Engine-owned process pool for CPU-bound work, so heavy handlers do not
+    stall the event loop. Functions and arguments must be picklable, i.e.
+    module-level functions of a plugin (plugins.<name>.<function>). Worth it
+    for jobs of tens of milliseconds and more: each call pays for pickling and IPC.
+
+    A job that hits its timeout is killed together with its worker: the pool
+    is replaced, so jobs running in it at that moment fail with BrokenProcessPool.
+    """
+
+    def __init__(self, workers: int = 2, timeout: Optional[float] = 30, paths: Optional[List[str]] = None):
+        self.workers = workers
+        self.timeout = timeout
+        # sys.path entries for workers: project root (system.*) and the plugins parent
+        self.paths = paths or []
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Modules whose functions ran in the current workers (they stay imported there)
+        self._modules: Set[str] = set()
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        # forkserver/spawn: forking a process that already runs sqlite and
+        # telethon threads is unsafe
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._modules = set()
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.paths,),
+        )
+
+    async def start(self):
+        """Creates the pool and warms all workers up."""
+        if self.workers <= 0 or self._pool is not None:
+            return
+        self._pool = self._create_pool()
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(*(
+                loop.run_in_executor(self._pool, _warmup) for _ in range(self.workers)
+            ))
+            logger.info(f"CPU pool ready ({self.workers} workers).")
+        except Exception as e:
+            logger.error(f"CPU pool warm-up failed: {e}")
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """
+        Runs fn(*args) in a worker process.
+        Without workers (CPU_WORKERS = 0) it falls back to a thread.
+        """
+        timeout = self.timeout if timeout is None else timeout
+
+        if self.workers <= 0:
+            return await asyncio.wait_for(asyncio.to_thread(fn, *args), timeout)
+
+        if self._pool is None:
+            self._pool = self._create_pool()
+        pool = self._pool
+        module = getattr(fn, "__module__", None)
+        if module:
+            self._modules.add(module)
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, fn, *args), timeout)
+        except asyncio.TimeoutError:
+            # The worker keeps running the job otherwise; enough of them and the pool is dead
+            logger.warning(f"CPU job {getattr(fn, '__qualname__', fn)} timed out after {timeout}s, recycling the pool.")
+            await self._replace(pool, kill=True)
+            raise
+        except BrokenProcessPool:
+            # A worker died (segfault, OOM kill): replace the pool for the next caller
+            logger.error("CPU pool is broken, recreating it.")
+            await self._replace(pool, kill=True)
+            raise
+
+    async def _replace(self, pool: ProcessPoolExecutor, kill: bool):
+        """Detaches pool (a new one is created on the next run) and stops it."""
+        if self._pool is pool:
+            self._pool = None
+        if kill:
+            await asyncio.to_thread(_terminate, pool)
+        else:
+            # Jobs already submitted still finish, then the old workers exit
+            pool.shutdown(wait=False)
+
+    async def release_module(self, module_name: str):
+        """
+        Called when a module is reloaded or removed. Workers import functions by
+        reference and would keep running the old code, so they are recycled.
+        """
+        if self._pool is None or module_name not in self._modules:
+            return
+        logger.info(f"Recycling CPU pool: '{module_name}' changed.")
+        await self._replace(self._pool, kill=False)
+
+    async def shutdown(self):
+        """Cancels queued jobs and stops the workers without waiting for running jobs."""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            await asyncio.to_thread(_terminate, pool)
+            logger.info("CPU pool stopped.")
@@ -2,8 +2,28 @@ import aiosqlite
 import json
 import logging
 import asyncio
+import os
+import pickle
+import sqlite3
+import sys
 import time
-from typing import Any, Optional, Callable
+import zlib
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Callable
+
+from .metrics import DatabaseStats
+
+# Опційні кодеки (працюємо і без них)
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 # Налаштування логера
 logger = logging.getLogger("Database")
@@ -20,10 +40,45 @@ class SerializationError(DatabaseError):
     """Помилка серіалізації даних."""
     pass
 
+# Формат BLOB-значення: перший байт — кодек (формат + прапорці стиснення).
+# Старі рядки зберігаються як TEXT (JSON) і читаються без заголовка.
+CODEC_JSON = 0x00
+CODEC_MSGPACK = 0x01
+CODEC_PICKLE = 0x02
+FLAG_ZLIB = 0x10
+FLAG_ZSTD = 0x20
+_FORMAT_MASK = 0x0F
+
+CODECS = {
+    "json": CODEC_JSON,
+    "msgpack": CODEC_MSGPACK,
+    "pickle": CODEC_PICKLE,
+}
+
 class Database:
-    def __init__(self, path: str, serializer: Callable = json.dumps, deserializer: Callable = json.loads):
+    def __init__(
+        self, 
+        path: str, 
+        serializer: Callable = json.dumps, 
+        deserializer: Callable = json.loads,
+        codec: str = "auto",
+        compress_threshold: Optional[int] = 64 * 1024,
+        read_pool_size: int = 3,
+        slow_threshold: float = 0.1
+    ):
+        """
+        :param codec: 'json', 'msgpack', 'pickle' або 'auto' (msgpack, якщо встановлений).
+        :param compress_threshold: Стискати значення, більші за цей розмір (None — ніколи).
+        :param read_pool_size: Кількість read-only з'єднань для get/scan (0 — читати через writer).
+        :param slow_threshold: Операції довші за це (сек) потрапляють у slow log.
+        """
         self.path = path
         self.conn: Optional[aiosqlite.Connection] = None
+
+        # Пул read-only з'єднань: WAL дозволяє читати паралельно із записом
+        self.read_pool_size = read_pool_size
+        self._readers: Optional[asyncio.Queue] = None
+        self._reader_conns: List[aiosqlite.Connection] = []
         
         # Блокування для запису (Write Lock) для уникнення Race Conditions
         self._write_lock = asyncio.Lock()
@@ -31,10 +86,82 @@ class Database:
         # Серіалізатори (можна замінити на orjson/ujson при ініціалізації)
         self._dumps = serializer
         self._loads = deserializer
+
+        # Кастомний серіалізатор має сенс лише з JSON-кодеком
+        if codec == "auto":
+            custom = serializer is not json.dumps
+            codec = "msgpack" if msgpack and not custom else "json"
+        self.codec = self._codec_id(codec)
+        self.compress_threshold = compress_threshold
         
         # Ліміт розміру значення (наприклад, 5MB)
         self.MAX_VALUE_SIZE = 5 * 1024 * 1024 
 
+        # Таймінги операцій (lock wait / execute / commit / serialize)
+        self.stats = DatabaseStats(slow_threshold=slow_threshold)
+
+        # Стара база без auto_vacuum: конвертується пізніше (enable_auto_vacuum)
+        self.needs_auto_vacuum = False
+
+    @staticmethod
+    def _codec_id(codec: str) -> int:
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}'")
+        if codec == "msgpack" and msgpack is None:
+            raise ValueError("Codec 'msgpack' requires the msgpack package")
+        return CODECS[codec]
+
+    def _encode(self, value: Any, codec: Optional[str] = None) -> bytes:
+        """Серіалізує значення у BLOB з байтом кодека на початку."""
+        fmt = self._codec_id(codec) if codec else self.codec
+
+        if fmt == CODEC_MSGPACK:
+            payload = msgpack.packb(value, use_bin_type=True)
+        elif fmt == CODEC_PICKLE:
+            # Тільки для довірених системних модулів
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            payload = self._dumps(value)
+            if isinstance(payload, str):
+                payload = payload.encode("utf-8")
+
+        flags = 0
+        if self.compress_threshold is not None and len(payload) > self.compress_threshold:
+            if zstandard:
+                packed, flag = zstandard.ZstdCompressor(level=3).compress(payload), FLAG_ZSTD
+            else:
+                packed, flag = zlib.compress(payload, 6), FLAG_ZLIB
+            # Стискаємо лише якщо це справді дає виграш
+            if len(packed) < len(payload):
+                payload, flags = packed, flag
+
+        return bytes((fmt | flags,)) + payload
+
+    def _decode(self, raw: Any) -> Any:
+        """Десеріалізує BLOB (або legacy JSON TEXT)."""
+        if isinstance(raw, str):
+            return self._loads(raw)
+
+        header, payload = raw[0], raw[1:]
+
+        if header & FLAG_ZSTD:
+            if zstandard is None:
+                raise SerializationError("Value is zstd-compressed but zstandard is not installed")
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        elif header & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+
+        fmt = header & _FORMAT_MASK
+        if fmt == CODEC_MSGPACK:
+            if msgpack is None:
+                raise SerializationError("Value is msgpack-encoded but msgpack is not installed")
+            return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        if fmt == CODEC_PICKLE:
+            return pickle.loads(payload)
+        if fmt == CODEC_JSON:
+            return self._loads(payload.decode("utf-8"))
+        raise SerializationError(f"Unknown codec byte: {header:#x}")
+
     async def connect(self, timeout: int = 5):
         """
         Підключається до БД, вмикає WAL та виконує міграції структури таблиць.
@@ -46,6 +173,9 @@ class Database:
             async with asyncio.timeout(timeout):
                 self.conn = await aiosqlite.connect(self.path)
                 
+                # Для нових баз діє лише до першого запису; старі конвертуються нижче
+                await self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+
                 # [1] WAL Mode для кращої швидкодії
                 await self.conn.execute("PRAGMA journal_mode=WAL;")
                 await self.conn.execute("PRAGMA synchronous=NORMAL;")
@@ -54,7 +184,7 @@ class Database:
                 await self.conn.execute("""
                     CREATE TABLE IF NOT EXISTS kv (
                         key TEXT PRIMARY KEY, 
-                        value TEXT
+                        value BLOB
                     )
                 """)
 
@@ -72,16 +202,111 @@ class Database:
                 )
                 
                 await self.conn.commit()
-                logger.info(f"Connected to DB at {self.path} (WAL enabled)")
+
+                # [5] auto_vacuum для старих баз вмикається лише повним VACUUM.
+                # Це довго на великих базах, тому не тут (під таймаутом), а у фоні.
+                async with self.conn.execute("PRAGMA auto_vacuum") as cursor:
+                    self.needs_auto_vacuum = (await cursor.fetchone())[0] != 2
+
+                # [6] Read-only з'єднання (після міграцій, щоб бачити актуальну схему)
+                await self._open_readers()
+                logger.info(f"Connected to DB at {self.path} (WAL enabled, {len(self._reader_conns)} readers)")
                 
         except asyncio.TimeoutError:
-            self.conn = None
+            await self._abort_connect()
             raise ConnectionError(f"Timeout connecting to database at {self.path}")
         except Exception as e:
-            self.conn = None
+            await self._abort_connect()
             logger.error(f"Connection failed: {e}")
             raise ConnectionError(f"Failed to connect: {e}")
 
+    async def _abort_connect(self):
+        """Закриває напіввідкрите з'єднання, щоб його потік не лишився висіти."""
+        await self._close_readers()
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            try:
+                await conn.close()
+            except Exception as e:
+                logger.error(f"Error closing DB after failed connect: {e}")
+
+    async def enable_auto_vacuum(self) -> bool:
+        """
+        Одноразова міграція старої бази на auto_vacuum=INCREMENTAL (повний VACUUM).
+        Переписує весь файл і весь цей час тримає write lock, тому Engine
+        викликає її на старті, до завантаження модулів (без таймауту connect()).
+        :return: True, якщо конвертація відбулась.
+        """
+        await self._ensure_connected()
+        if not self.needs_auto_vacuum:
+            return False
+
+        size = os.path.getsize(self.path) if self.path != ":memory:" else 0
+        logger.warning(
+            f"🛠 Database migration: Enabling incremental auto_vacuum "
+            f"(one-time VACUUM of {size / 1024 / 1024:.1f} MB, may take a while)..."
+        )
+        timing = self.stats.begin("vacuum")
+        failed = True
+        started = time.perf_counter()
+        try:
+            async with self._write_lock:
+                timing.lap("lock_wait")
+                await self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+                await self.conn.execute("VACUUM")
+                timing.lap("execute")
+            self.needs_auto_vacuum = False
+            failed = False
+        finally:
+            timing.done(failed)
+        logger.info(f"Incremental auto_vacuum enabled in {time.perf_counter() - started:.2f}s.")
+        return True
+
+    async def _open_readers(self):
+        """Відкриває пул read-only з'єднань. Без пулу всі читання йдуть через writer."""
+        if self.read_pool_size <= 0 or self.path == ":memory:":
+            return
+
+        uri = f"{Path(self.path).resolve().as_uri()}?mode=ro"
+        queue = asyncio.Queue()
+        try:
+            for _ in range(self.read_pool_size):
+                reader = await aiosqlite.connect(uri, uri=True)
+                self._reader_conns.append(reader)
+                queue.put_nowait(reader)
+        except Exception as e:
+            logger.warning(f"Read pool unavailable, falling back to writer connection: {e}")
+            await self._close_readers()
+            return
+
+        self._readers = queue
+
+    async def _close_readers(self):
+        self._readers = None
+        for reader in self._reader_conns:
+            try:
+                await reader.close()
+            except Exception as e:
+                logger.error(f"Error closing reader: {e}")
+        self._reader_conns = []
+
+    @asynccontextmanager
+    async def _reader(self):
+        """
+        Видає з'єднання для читання.
+        Якщо writer має незакомічені зміни (commit=False), читаємо через нього,
+        щоб зберегти read-your-writes.
+        """
+        if self._readers is None or self.conn.in_transaction:
+            yield self.conn
+            return
+
+        reader = await self._readers.get()
+        try:
+            yield reader
+        finally:
+            self._readers.put_nowait(reader)
+
     async def _ensure_connected(self):
         """Перевіряє з'єднання і намагається перепідключитись."""
         if not self.conn:
@@ -96,40 +321,52 @@ class Database:
         key: str, 
         value: Any, 
         ttl: Optional[int] = None, 
-        commit: bool = True
+        commit: bool = True,
+        codec: Optional[str] = None
     ):
         """
         Зберігає значення.
         :param ttl: Час життя в секундах.
         :param commit: Чи записувати на диск одразу.
+        :param codec: Перевизначити кодек для цього ключа (напр. 'pickle').
         """
         if not key:
             raise ValueError("Key cannot be empty")
         
         await self._ensure_connected()
+        timing = self.stats.begin("set", key)
+        failed = True
 
         try:
-            serialized = self._dumps(value)
-        except (TypeError, ValueError) as e:
-            raise SerializationError(f"Value for '{key}' is not serializable: {e}")
+            try:
+                serialized = self._encode(value, codec)
+            except (TypeError, ValueError, OverflowError, pickle.PicklingError) as e:
+                raise SerializationError(f"Value for '{key}' is not serializable: {e}")
+            timing.lap("serialize")
 
-        if len(serialized) > self.MAX_VALUE_SIZE:
-            raise ValueError(f"Value size ({len(serialized)} bytes) exceeds limit")
+            if len(serialized) > self.MAX_VALUE_SIZE:
+                raise ValueError(f"Value size ({len(serialized)} bytes) exceeds limit")
 
-        # Розрахунок часу вигасання
-        expires_at = (time.time() + ttl) if ttl else None
+            # Розрахунок часу вигасання
+            expires_at = (time.time() + ttl) if ttl else None
 
-        async with self._write_lock:
-            try:
-                await self.conn.execute(
-                    "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", 
-                    (key, serialized, expires_at)
-                )
-                if commit:
-                    await self.conn.commit()
-            except Exception as e:
-                logger.error(f"Write error for '{key}': {e}")
-                raise DatabaseError(e)
+            async with self._write_lock:
+                timing.lap("lock_wait")
+                try:
+                    await self.conn.execute(
+                        "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", 
+                        (key, serialized, expires_at)
+                    )
+                    timing.lap("execute")
+                    if commit:
+                        await self.conn.commit()
+                        timing.lap("commit")
+                except Exception as e:
+                    logger.error(f"Write error for '{key}': {e}")
+                    raise DatabaseError(e)
+            failed = False
+        finally:
+            timing.done(failed)
 
     async def get(self, key: str, default: Any = None) -> Any:
         """
@@ -139,52 +376,468 @@ class Database:
             return default
 
         await self._ensure_connected()
+        timing = self.stats.begin("get", key)
+        failed = False
 
         try:
             # Вибираємо тільки якщо ключ існує І (не має терміну дії АБО термін ще не вийшов)
             query = "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)"
             current_time = time.time()
             
-            async with self.conn.execute(query, (key, current_time)) as cur:
-                row = await cur.fetchone()
+            async with self._reader() as conn:
+                timing.lap("lock_wait")
+                async with conn.execute(query, (key, current_time)) as cur:
+                    row = await cur.fetchone()
+                timing.lap("execute")
                 
             if row:
                 try:
-                    return self._loads(row[0])
+                    return self._decode(row[0])
                 except Exception as e:
-                    logger.error(f"JSON Corruption for key '{key}': {e}")
+                    failed = True
+                    logger.error(f"Value corruption for key '{key}': {e}")
                     return default
+                finally:
+                    timing.lap("deserialize")
             return default
             
         except Exception as e:
+            failed = True
             logger.error(f"Read error for '{key}': {e}")
             return default
+        finally:
+            timing.done(failed)
+
+    async def _read_locked(self, key: str, timing) -> tuple:
+        """
+        Читає ключ через writer (викликати під write lock).
+        :return: (exists, value, expires_at)
+        """
+        async with self.conn.execute(
+            "SELECT value, expires_at FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ) as cur:
+            row = await cur.fetchone()
+        timing.lap("execute")
+        if not row:
+            return False, None, None
+        value = self._decode(row[0])
+        timing.lap("deserialize")
+        return True, value, row[1]
+
+    async def _write_locked(self, key: str, value: Any, expires_at: Optional[float], commit: bool, timing):
+        """Записує ключ через writer (викликати під write lock)."""
+        serialized = self._encode(value)
+        timing.lap("serialize")
+        if len(serialized) > self.MAX_VALUE_SIZE:
+            raise ValueError(f"Value size ({len(serialized)} bytes) exceeds limit")
+        await self.conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, serialized, expires_at)
+        )
+        timing.lap("execute")
+        if commit:
+            await self.conn.commit()
+            timing.lap("commit")
+
+    async def _atomic(
+        self, 
+        op: str, 
+        key: str, 
+        fn: Callable[[bool, Any], tuple], 
+        ttl: Optional[int], 
+        commit: bool
+    ):
+        """
+        Read-modify-write в одній транзакції під write lock.
+        fn(exists, current) -> (write?, new_value, result)
+        TTL: None — зберегти поточний термін дії ключа.
+        """
+        if not key:
+            raise ValueError("Key cannot be empty")
+        await self._ensure_connected()
+        timing = self.stats.begin(op, key)
+        failed = True
+
+        try:
+            async with self._write_lock:
+                timing.lap("lock_wait")
+                try:
+                    exists, current, expires_at = await self._read_locked(key, timing)
+                    write, new_value, result = fn(exists, current)
+                    if write:
+                        if ttl is not None:
+                            expires_at = time.time() + ttl
+                        await self._write_locked(key, new_value, expires_at, commit, timing)
+                    failed = False
+                    return result
+                except (DatabaseError, ValueError, TypeError):
+                    raise
+                except Exception as e:
+                    logger.error(f"Atomic update error for '{key}': {e}")
+                    raise DatabaseError(e)
+        finally:
+            timing.done(failed)
+
+    async def incr(self, key: str, delta: float = 1, ttl: Optional[int] = None, commit: bool = True):
+        """
+        Атомарно збільшує числове значення (відсутній ключ = 0).
+        :param ttl: Новий час життя; None — залишити поточний.
+        :return: Нове значення.
+        """
+        def step(exists, current):
+            current = current if exists else 0
+            if isinstance(current, bool) or not isinstance(current, (int, float)):
+                raise TypeError(f"Value for '{key}' is not a number")
+            new_value = current + delta
+            return True, new_value, new_value
+
+        return await self._atomic("incr", key, step, ttl, commit)
+
+    async def cas(self, key: str, expected: Any, new: Any, ttl: Optional[int] = None, commit: bool = True) -> bool:
+        """
+        Compare-and-set: записує `new`, тільки якщо поточне значення == expected.
+        Відсутній ключ порівнюється як None.
+        :return: True, якщо запис відбувся.
+        """
+        def step(exists, current):
+            matched = (current if exists else None) == expected
+            return matched, new, matched
+
+        return await self._atomic("cas", key, step, ttl, commit)
+
+    async def update(
+        self, 
+        key: str, 
+        fn: Callable[[Any], Any], 
+        default: Any = None, 
+        ttl: Optional[int] = None, 
+        commit: bool = True
+    ) -> Any:
+        """
+        Атомарно застосовує fn до поточного значення (або default).
+        fn виконується під write lock — має бути швидкою і синхронною.
+        :return: Нове значення.
+        """
+        def step(exists, current):
+            new_value = fn(current if exists else default)
+            return True, new_value, new_value
+
+        return await self._atomic("update", key, step, ttl, commit)
+
+    @staticmethod
+    def _prefix_upper_bound(prefix: str) -> Optional[str]:
+        """
+        Найменший рядок, більший за всі ключі з префіксом ('ab' -> 'ac').
+        U+10FFFF не має наступника: такі символи з кінця відкидаються;
+        якщо не лишилось нічого — верхньої межі немає (None).
+        """
+        stripped = prefix.rstrip(chr(sys.maxunicode))
+        if not stripped:
+            return None
+        return stripped[:-1] + chr(ord(stripped[-1]) + 1)
+
+    async def scan(self, prefix: str = "", limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Повертає всі живі ключі з префіксом (у порядку ключів).
+        Пошкоджені значення пропускаються.
+        """
+        await self._ensure_connected()
+
+        query = "SELECT key, value FROM kv WHERE key >= ? AND (expires_at IS NULL OR expires_at > ?)"
+        params: list = [prefix, time.time()]
+        upper = self._prefix_upper_bound(prefix)
+        if upper is not None:
+            # Діапазон по PRIMARY KEY замість LIKE (використовує індекс)
+            query += " AND key < ?"
+            params.append(upper)
+        query += " ORDER BY key"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        result = {}
+        timing = self.stats.begin("scan", prefix)
+        try:
+            async with self._reader() as conn:
+                timing.lap("lock_wait")
+                async with conn.execute(query, params) as cur:
+                    rows = await cur.fetchall()
+                timing.lap("execute")
+        except Exception as e:
+            logger.error(f"Scan error for prefix '{prefix}': {e}")
+            timing.done(failed=True)
+            return result
+
+        for key, raw in rows:
+            try:
+                result[key] = self._decode(raw)
+            except Exception as e:
+                logger.error(f"Value corruption for key '{key}': {e}")
+        timing.lap("deserialize")
+        timing.done()
+        return result
 
     async def delete(self, key: str, commit: bool = True):
         """Видаляє ключ."""
         await self._ensure_connected()
-        
-        async with self._write_lock:
-            await self.conn.execute("DELETE FROM kv WHERE key = ?", (key,))
-            if commit:
-                await self.conn.commit()
+        timing = self.stats.begin("delete", key)
+        failed = True
+
+        try:
+            async with self._write_lock:
+                timing.lap("lock_wait")
+                await self.conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+                timing.lap("execute")
+                if commit:
+                    await self.conn.commit()
+                    timing.lap("commit")
+            failed = False
+        finally:
+            timing.done(failed)
 
     async def flush(self):
         """Примусово записує зміни на диск."""
         await self._ensure_connected()
-        async with self._write_lock:
-            await self.conn.commit()
+        timing = self.stats.begin("flush")
+        failed = True
 
-    async def purge_expired(self):
-        """Очищає прострочені ключі."""
+        try:
+            async with self._write_lock:
+                timing.lap("lock_wait")
+                await self.conn.commit()
+                timing.lap("commit")
+            failed = False
+        finally:
+            timing.done(failed)
+
+    async def purge_expired(
+        self, 
+        batch_size: int = 500, 
+        pause: float = 0.05, 
+        max_batches: Optional[int] = None
+    ) -> int:
+        """
+        Очищає прострочені ключі пачками, відпускаючи write lock між ними.
+        :param max_batches: Обмеження кількості пачок за виклик (None — до кінця).
+        :return: Кількість видалених рядків.
+        """
         await self._ensure_connected()
         current_time = time.time()
-        async with self._write_lock:
-            await self.conn.execute("DELETE FROM kv WHERE expires_at < ?", (current_time,))
-            await self.conn.commit()
+        deleted = 0
+        batches = 0
+        timing = self.stats.begin("purge_expired")
+        failed = True
+
+        try:
+            while max_batches is None or batches < max_batches:
+                async with self._write_lock:
+                    timing.lap("lock_wait")
+                    cur = await self.conn.execute(
+                        "DELETE FROM kv WHERE rowid IN "
+                        "(SELECT rowid FROM kv WHERE expires_at < ? LIMIT ?)",
+                        (current_time, batch_size)
+                    )
+                    count = cur.rowcount
+                    await cur.close()
+                    timing.lap("execute")
+                    await self.conn.commit()
+                    timing.lap("commit")
+
+                deleted += count
+                batches += 1
+                if count < batch_size:
+                    break
+                # Даємо шанс іншим записувачам
+                await asyncio.sleep(pause)
+                timing.skip()
+            failed = False
+        finally:
+            timing.done(failed)
+        return deleted
+
+    async def next_expiry(self) -> Optional[float]:
+        """Час найближчого вигасання (unix timestamp) або None."""
+        await self._ensure_connected()
+        async with self._reader() as conn:
+            async with conn.execute("SELECT MIN(expires_at) FROM kv") as cur:
+                row = await cur.fetchone()
+        return row[0] if row else None
+
+    async def checkpoint(self, mode: str = "TRUNCATE") -> tuple:
+        """
+        Переносить WAL у основний файл і обрізає його.
+        :return: (busy, wal_pages, checkpointed_pages)
+        """
+        await self._ensure_connected()
+        timing = self.stats.begin("checkpoint")
+        failed = True
+
+        try:
+            async with self._write_lock:
+                timing.lap("lock_wait")
+                async with self.conn.execute(f"PRAGMA wal_checkpoint({mode})") as cur:
+                    row = await cur.fetchone()
+                timing.lap("execute")
+            failed = False
+        finally:
+            timing.done(failed)
+        return tuple(row) if row else (0, 0, 0)
+
+    async def incremental_vacuum(self, pages: int = 1000) -> int:
+        """
+        Повертає ОС до `pages` вільних сторінок.
+        :return: Кількість звільнених сторінок.
+        """
+        await self._ensure_connected()
+        timing = self.stats.begin("incremental_vacuum")
+        failed = True
+
+        try:
+            async with self._write_lock:
+                timing.lap("lock_wait")
+                async with self.conn.execute("PRAGMA freelist_count") as cur:
+                    before = (await cur.fetchone())[0]
+                if not before:
+                    failed = False
+                    return 0
+                async with self.conn.execute(f"PRAGMA incremental_vacuum({int(pages)})") as cur:
+                    await cur.fetchall()
+                await self.conn.commit()
+                async with self.conn.execute("PRAGMA freelist_count") as cur:
+                    after = (await cur.fetchone())[0]
+                timing.lap("execute")
+            failed = False
+        finally:
+            timing.done(failed)
+        return before - after
+
+    async def backup(self, path: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Онлайн-бекап одним проходом (VACUUM INTO) з окремого read-only з'єднання.
+        У WAL читач не блокує writer, а знімок консистентний на момент старту,
+        тож постійні записи не змушують копіювання починатися заново.
+        Файл з'являється атомарно; при таймауті/скасуванні копіювання переривається.
+        :return: Статистика (path, pages, size, seconds).
+        """
+        await self._ensure_connected()
+        if self.path == ":memory:":
+            raise DatabaseError("In-memory database cannot be backed up")
+
+        tmp_path = f"{path}.part"
+        stats = {"path": path, "pages": 0}
+        uri = f"{Path(self.path).resolve().as_uri()}?mode=ro"
+        # Джерело створюється в потоці, але interrupt() викликається з event loop
+        holder: List[sqlite3.Connection] = []
+
+        def run():
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            source = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            holder.append(source)
+            try:
+                source.execute("VACUUM INTO ?", (tmp_path,))
+            finally:
+                source.close()
+            target = sqlite3.connect(tmp_path)
+            try:
+                stats["pages"] = target.execute("PRAGMA page_count").fetchone()[0]
+            finally:
+                target.close()
+            os.replace(tmp_path, path)
+
+        def interrupt():
+            for source in holder:
+                try:
+                    source.interrupt()
+                except sqlite3.ProgrammingError:
+                    pass  # Вже закрите — копіювання завершилось
+
+        started = time.perf_counter()
+        timing = self.stats.begin("backup")
+        failed = True
+        job = None
+        try:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            job = asyncio.ensure_future(asyncio.to_thread(run))
+            await asyncio.wait_for(asyncio.shield(job), timeout)
+            timing.lap("execute")
+            failed = False
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # Потік сам не зупиниться: перериваємо VACUUM і чекаємо його виходу
+            interrupt()
+            if job is not None:
+                await asyncio.gather(job, return_exceptions=True)
+            self._remove_partial(tmp_path)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            logger.error(f"Backup to '{path}' timed out after {timeout}s")
+            raise DatabaseError(f"Backup timed out after {timeout}s")
+        except Exception as e:
+            self._remove_partial(tmp_path)
+            logger.error(f"Backup to '{path}' failed: {e}")
+            raise DatabaseError(f"Backup failed: {e}")
+        finally:
+            timing.done(failed)
+
+        stats["size"] = os.path.getsize(path)
+        stats["seconds"] = time.perf_counter() - started
+        logger.info(f"Backup saved to {path} ({stats['size']} bytes, {stats['seconds']:.2f}s)")
+        return stats
+
+    @staticmethod
+    def _remove_partial(tmp_path: str):
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    async def migrate_legacy(self, batch_size: int = 500, pause: float = 0.01) -> int:
+        """
+        Онлайн-міграція старих JSON TEXT рядків у BLOB-формат.
+        Працює пачками, відпускаючи write lock між ними.
+        :return: Кількість конвертованих рядків.
+        """
+        await self._ensure_connected()
+        converted = 0
+        last_key = ""
+
+        while True:
+            async with self.conn.execute(
+                "SELECT key, value FROM kv WHERE typeof(value) = 'text' AND key > ? ORDER BY key LIMIT ?",
+                (last_key, batch_size)
+            ) as cur:
+                rows = await cur.fetchall()
+
+            if not rows:
+                break
+            last_key = rows[-1][0]
+
+            updates = []
+            for key, raw in rows:
+                try:
+                    updates.append((self._encode(self._loads(raw)), key))
+                except Exception as e:
+                    logger.warning(f"Skipping migration of '{key}': {e}")
+
+            async with self._write_lock:
+                # typeof = 'text' захищає від перезапису свіжих значень з set()
+                await self.conn.executemany(
+                    "UPDATE kv SET value = ? WHERE key = ? AND typeof(value) = 'text'", updates
+                )
+                await self.conn.commit()
+
+            converted += len(updates)
+            await asyncio.sleep(pause)
+
+        if converted:
+            logger.info(f"Migrated {converted} legacy JSON rows to binary format.")
+        return converted
 
     async def close(self):
         """Безпечно закриває з'єднання."""
+        await self._close_readers()
         if self.conn:
             try:
                 await self.conn.commit()
@@ -1,3 +1,4 @@
+import inspect
 import logging
 from typing import Optional, List, Callable, Any
 from .registry import CommandMeta
@@ -11,8 +12,9 @@ def command(name: Optional[str] = None, aliases: Optional[List[str]] = None, **f
     
     Args:
         name: Explicit command trigger. If None, function name is used.
-        aliases: List of alternative triggers.
-        **flags: Custom flags (e.g., admin_only=True, hidden=True).
+              "root sub" declares a subcommand (e.g. "haruka add").
+        aliases: List of alternative triggers (for a subcommand: alternative sub names).
+        **flags: Custom flags (e.g., allow_sudo=True, timeout=600).
     """
     # [2] Fix mutable default argument & freeze it
     # Converting to tuple prevents modification of the list reference later
@@ -34,9 +36,9 @@ def command(name: Optional[str] = None, aliases: Optional[List[str]] = None, **f
         if not trigger:
             raise ValueError(f"Command name cannot be empty for function '{func.__name__}'")
         
-        # Optional: Warn about spaces in command names (depends on your parser)
-        if ' ' in trigger:
-            logger.warning(f"Command '{trigger}' contains spaces. Ensure your parser supports this.")
+        # A space separates command and subcommand; deeper nesting is not routed
+        if len(trigger.split()) > 2:
+            raise ValueError(f"Command '{trigger}' is nested too deep, use 'command subcommand'")
 
         # [1] Set module_name to empty/None initially.
         # The Registry.register_module() method MUST update this field later.
@@ -45,7 +47,8 @@ def command(name: Optional[str] = None, aliases: Optional[List[str]] = None, **f
             handler=func,
             module_name="",  # Placeholder, will be injected by Registry
             aliases=list(safe_aliases), # Convert back to list if CommandMeta expects list
-            flags=flags
+            flags=flags,
+            doc=inspect.cleandoc(func.__doc__) if func.__doc__ else ""
         )
         return func
 
@@ -4,6 +4,8 @@ import time
 from typing import Dict, Optional
 from .config import Config
 from .context import Context
+from .metrics import CommandStats
+from .registry import normalize_trigger
 
 logger = logging.getLogger("Dispatcher")
 
@@ -13,6 +15,10 @@ class Dispatcher:
         # [9] Simple in-memory cooldown: user_id -> last_command_time
         self._cooldowns: Dict[int, float] = {}
         self.COOLDOWN_RATE = 0.5  # Seconds between commands for one user
+        # chat_id -> last "did you mean" reply (monotonic)
+        self._suggested: Dict[int, float] = {}
+        # Timings per command path ('ping', 'haruka install')
+        self.stats = CommandStats()
 
     async def handle(self, event):
         # [1] Validation: Check for empty text or None
@@ -35,19 +41,35 @@ class Dispatcher:
 
         # Extract trigger: "!ping arg" -> "ping"
         # .split(maxsplit=1) is more efficient than full split
-        try:
-            trigger_part = text[len(matched_prefix):].lstrip().split(maxsplit=1)[0]
-            trigger = trigger_part.casefold() # [10] Stronger than .lower() for unicode
-        except IndexError:
+        # maxsplit=2: the second word may be a subcommand
+        words = text[len(matched_prefix):].lstrip().split(maxsplit=2)
+        if not words:
             return
+        trigger = words[0].casefold() # [10] Stronger than .lower() for unicode
+        # [10] Registry keys are NFKC-casefolded; ASCII is already in that form
+        if not trigger.isascii():
+            trigger = normalize_trigger(trigger)
 
-        # [3] Safe Registry Access (assuming Registry has get_command method)
-        # Using public API instead of accessing .commands dict directly
-        meta = await self.engine.registry.get_command(trigger)
+        # [3] Safe Registry Access: lock-free lookup in the current immutable snapshot
+        meta = self.engine.registry.get_command(trigger)
         
         if not meta:
+            # Only for our own messages: never answer other people's text
+            if event.out:
+                await self._suggest(event, matched_prefix, trigger)
             return
 
+        # [12] Subcommands: "haruka add" is a single key of the flat table.
+        # Aliases of the root resolve through meta.key ('.hk add' -> 'haruka add').
+        subcommand = False
+        if len(words) > 1 and meta.key in self.engine.registry.snapshot.groups:
+            sub = words[1].casefold()
+            if not sub.isascii():
+                sub = normalize_trigger(sub)
+            sub_meta = self.engine.registry.get_command(f"{meta.key} {sub}")
+            if sub_meta:
+                meta, trigger, subcommand = sub_meta, sub_meta.key, True
+
         # [4] Security: Ownership Check
         # Explicit .get(..., False) ensures secure default
         if not event.out and not meta.flags.get('allow_sudo', False):
@@ -68,25 +90,36 @@ class Dispatcher:
         ctx = Context(event, self.engine)
         if not ctx.valid:
             return
+        # Normalized trigger as matched, plus the resolved command
+        if subcommand:
+            ctx.enter_subcommand(trigger)
+        ctx.trigger = trigger
+        ctx.command = meta
 
         # [7] Enhanced Contextual Logging
         chat_id = event.chat_id
         logger.info(f"Command '{trigger}' called by user {sender_id} in chat {chat_id}")
 
         # Execution Block
+        started = time.perf_counter()
+        status = "ok"
         try:
             # [6] Timeout & Task Management
-            # We use wait_for to enforce Config limits
-            await asyncio.wait_for(
-                meta.handler(ctx), 
-                timeout=Config.COMMAND_TIMEOUT
-            )
+            # Per-command `timeout` flag, otherwise the Config limit
+            # [11] Tasks spawned by the handler belong to the command's module scope
+            with self.engine.scope_for(meta.module_name).activate():
+                await asyncio.wait_for(
+                    meta.handler(ctx), 
+                    timeout=meta.flags.get('timeout', Config.COMMAND_TIMEOUT)
+                )
         
         except asyncio.TimeoutError:
+            status = "timeout"
             logger.warning(f"Command '{trigger}' timed out for user {sender_id}")
             await self._safe_err(ctx, "Execution time exceeded (Timeout).")
             
         except Exception as e:
+            status = "error"
             # [7] Full Traceback with Context
             logger.error(
                 f"Crash in command '{trigger}' (User: {sender_id}): {e}", 
@@ -95,6 +128,44 @@ class Dispatcher:
             # [8] Safe error reporting
             await self._safe_err(ctx, f"Internal Error: {e}")
 
+        finally:
+            # Keyed by canonical name: aliases count toward their command, subcommands on their own
+            self.stats.record(meta.name, time.perf_counter() - started, status)
+
+    async def _suggest(self, event, prefix: str, trigger: str):
+        """Replies "did you mean" for an unknown trigger (rate-limited per chat)."""
+        if not Config.SUGGEST_COMMANDS or not trigger[:1].isalnum():
+            return
+
+        chat_id = event.chat_id
+        now = time.monotonic()
+        if now - self._suggested.get(chat_id, 0) < Config.SUGGEST_COOLDOWN:
+            return
+
+        matches = self.engine.registry.suggestions.suggest(trigger)
+        if not matches:
+            return
+
+        try:
+            # Per-chat opt-out (.suggest off); read only when there is something to say
+            if await self.engine.db.get(f"suggest_off:{chat_id}", False):
+                return
+            self._suggested[chat_id] = now
+
+            # A reply, never an edit: the typo may well be ordinary text ('.NET is great').
+            # ctx.warn() would escape our markup, so the HTML is built here.
+            ctx = Context(event, self.engine)
+            escape = ctx.escape
+            options = " or ".join(f"<code>{escape(prefix + m)}</code>" for m in matches)
+            await ctx.respond(
+                f"<b>⚠️ Unknown command</b> <code>{escape(prefix + trigger)}</code>. Did you mean {options}?",
+                parse_mode='html',
+                reply_to=event.id,
+                force_new=True
+            )
+        except Exception as e:
+            logger.debug(f"Suggestion for '{trigger}' failed: {e}")
+
     async def _safe_err(self, ctx: Context, message: str):
         """
         [8] Helper to safely send error messages.
@@ -1,6 +1,10 @@
 import logging
 import asyncio
+import inspect
+import os
 import sys
+import time
+from typing import Any, Dict, Optional
 from telethon import TelegramClient, events
 from .config import Config
 from .registry import Registry
@@ -8,49 +12,218 @@ from .loader import Loader
 from .dispatcher import Dispatcher
 from .database import Database
 from .ratelimit import RateLimiter
+from .cpupool import CpuPool
+from .http_client import HttpClient
+from .scope import ModuleScope, current_scope
+from .timeline import Timeline
 
 # [8] Specific logger for Engine
 logger = logging.getLogger("Haruka.Engine")
 
 class Engine:
     def __init__(self):
+        # Startup profiler (phases + per-module import/register/hook spans)
+        self.timeline = Timeline()
+
         # Initialize client without starting it yet
         self.client = TelegramClient(Config.SESSION_NAME, Config.API_ID, Config.API_HASH)
         
         # [1] Do not cache get_event_loop() early, rely on running loop
         
         # [2] Explicitly pass DB_FILE
-        self.db = Database(path=Config.DB_FILE)
+        self.db = Database(path=Config.DB_FILE, slow_threshold=Config.DB_SLOW_OP_THRESHOLD)
         
+        # Per-module resource scopes (handlers, tasks, jobs) for clean reloads
+        self.scopes: Dict[str, ModuleScope] = {}
+
         # Initialize Core Components
-        self.registry = Registry()
+        self.registry = Registry(on_remove=self.teardown_module)
         self.loader = Loader(self)
         self.dispatcher = Dispatcher(self)
         self.limiter = RateLimiter(
             max_retries=3,
             max_delay_per_request=300
         )
+        self.watcher = None
+        if Config.WATCH_PLUGINS:
+            # ctypes/inotify are only needed when hot reload is on
+            from .watcher import PluginWatcher
+            self.watcher = PluginWatcher(self)
+        self.cpu = CpuPool(
+            workers=Config.CPU_WORKERS,
+            timeout=Config.CPU_TASK_TIMEOUT,
+            # Workers import jobs by module name ('plugins.cute'), independent of their cwd
+            paths=[os.path.dirname(Config.SYSTEM_DIR), os.path.dirname(os.path.abspath(Config.PLUGINS_DIR))],
+        )
+        # Shared HTTP client for system modules and plugins (session created on first request)
+        self.http = HttpClient(
+            limit=Config.HTTP_LIMIT,
+            limit_per_host=Config.HTTP_LIMIT_PER_HOST,
+            dns_ttl=Config.HTTP_DNS_TTL,
+            keepalive=Config.HTTP_KEEPALIVE,
+            connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+            read_timeout=Config.HTTP_READ_TIMEOUT,
+            total_timeout=Config.HTTP_TOTAL_TIMEOUT,
+            retries=Config.HTTP_RETRIES,
+        )
         
         # Connect Event Handler
         # [4] Dispatcher.handle already contains internal try/except wrappers
         self.client.add_event_handler(self.dispatcher.handle, events.NewMessage())
 
+        # Handlers added from now on (client.on / add_event_handler) are attributed
+        # to the module scope active at that moment
+        self._raw_add_event_handler = self.client.add_event_handler
+        self.client.add_event_handler = self._add_event_handler
+
+    def _add_event_handler(self, callback, event=None):
+        scope = current_scope.get()
+        if scope is not None:
+            scope.add_handler(callback, event)
+        return self._raw_add_event_handler(callback, event)
+
+    def _task_factory(self, loop, coro, context=None):
+        """
+        Attributes tasks running a module's own coroutines to its scope.
+        Tasks of libraries (Telethon senders etc.) started from module code are
+        not tracked: reloading the module must not cancel shared client state.
+        """
+        task = asyncio.Task(coro, loop=loop, context=context)
+        scope = context.get(current_scope) if context is not None else current_scope.get()
+        if scope is not None and scope.owns(coro):
+            scope.track_task(task)
+        return task
+
+    def create_task(self, coro, name: str = None) -> asyncio.Task:
+        """Starts a task owned by the current module (cancelled when it is reloaded/removed)."""
+        scope = current_scope.get()
+        if scope is not None:
+            return scope.create_task(coro, name=name)
+        return asyncio.get_running_loop().create_task(coro, name=name)
+
+    @property
+    def scope(self) -> Optional[ModuleScope]:
+        """Scope of the module currently running (inside register() or a command)."""
+        return current_scope.get()
+
+    def scope_for(self, module_name: str) -> ModuleScope:
+        scope = self.scopes.get(module_name)
+        if scope is None:
+            scope = self.scopes[module_name] = ModuleScope(module_name, self.client)
+        return scope
+
+    async def teardown_module(self, module_name: str, module: Any):
+        """
+        Releases everything a module acquired: calls its optional unregister()
+        hook, removes its event handlers, cancels its tasks and jobs.
+        """
+        hook = getattr(module, "unregister", None)
+        if callable(hook):
+            try:
+                scope = self.scope_for(module_name)
+                with scope.activate():
+                    if inspect.iscoroutinefunction(hook):
+                        await hook(self)
+                    else:
+                        hook(self)
+            except Exception as e:
+                logger.error(f"unregister() of '{module_name}' failed: {e}", exc_info=True)
+
+        # Full removal (not a reload): drop the module object and its hash too
+        if module_name not in self.registry.modules:
+            if sys.modules.get(module_name) is module:
+                del sys.modules[module_name]
+            self.loader.hashes.pop(module_name, None)
+
+        scope = self.scopes.pop(module_name, None)
+        if scope is not None:
+            handlers, tasks, jobs = await scope.close()
+            if handlers or tasks or jobs:
+                logger.info(
+                    f"Released '{module_name}': {handlers} handlers, {tasks} tasks, {jobs} jobs."
+                )
+
+        # Workers still hold the old version of the module's functions
+        await self.cpu.release_module(module_name)
+
     async def _background_maintenance(self):
-        """[6] Periodic background tasks (DB Purge, etc.)"""
+        """[6] Periodic background tasks (TTL expiry, WAL maintenance)"""
         logger.info("Maintenance task started.")
+
+        # Online migration of legacy JSON rows to the binary format
+        try:
+            await self.db.migrate_legacy()
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            logger.error(f"Legacy row migration failed: {e}")
+
+        next_wal = time.time() + Config.WAL_MAINTENANCE_INTERVAL
+        next_backup = (time.time() + Config.BACKUP_INTERVAL) if Config.BACKUP_INTERVAL else float("inf")
+
         while True:
             try:
-                # Run cleanup every hour
-                await asyncio.sleep(3600)
-                if hasattr(self.db, 'purge_expired'):
-                    await self.db.purge_expired()
-                    logger.debug("Database TTL purge completed.")
+                # Sleep until the next known expiry (bounded), not a fixed hour
+                now = time.time()
+                next_expiry = await self.db.next_expiry()
+                wake_at = min(next_wal, next_backup, now + Config.EXPIRY_MAX_SLEEP)
+                if next_expiry is not None:
+                    wake_at = min(wake_at, next_expiry)
+                await asyncio.sleep(max(1.0, wake_at - now))
+
+                # Bounded chunked expiry; leftovers are picked up on the next tick
+                started = time.perf_counter()
+                purged = await self.db.purge_expired(
+                    batch_size=Config.EXPIRY_BATCH_SIZE,
+                    max_batches=Config.EXPIRY_MAX_BATCHES
+                )
+                if purged:
+                    logger.info(f"Expired {purged} keys in {time.perf_counter() - started:.3f}s.")
+
+                if time.time() >= next_wal:
+                    next_wal = time.time() + Config.WAL_MAINTENANCE_INTERVAL
+                    busy, wal_pages, moved = await self.db.checkpoint("TRUNCATE")
+                    freed = await self.db.incremental_vacuum()
+                    logger.info(
+                        f"WAL maintenance: checkpointed {moved}/{wal_pages} pages "
+                        f"(busy={busy}), vacuum freed {freed} pages."
+                    )
+
+                if time.time() >= next_backup:
+                    next_backup = time.time() + Config.BACKUP_INTERVAL
+                    # Bounded, so a slow snapshot can't stall expiry and WAL maintenance
+                    await self.create_backup(timeout=Config.BACKUP_TIMEOUT or None)
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Maintenance task error: {e}")
                 await asyncio.sleep(60) # Wait a bit before retry
 
+    async def create_backup(self, path: str = None, timeout: Optional[float] = None) -> dict:
+        """
+        Online database snapshot. Without a path, writes a timestamped file
+        into Config.BACKUP_DIR and prunes old snapshots beyond BACKUP_KEEP.
+        """
+        if path:
+            return await self.db.backup(path, timeout=timeout)
+
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        base = os.path.splitext(os.path.basename(Config.DB_FILE))[0]
+        stats = await self.db.backup(os.path.join(Config.BACKUP_DIR, f"{base}-{stamp}.db"), timeout=timeout)
+
+        # Keep only the newest scheduled snapshots
+        snapshots = sorted(
+            f for f in os.listdir(Config.BACKUP_DIR)
+            if f.startswith(f"{base}-") and f.endswith(".db")
+        )
+        for old in snapshots[:-Config.BACKUP_KEEP] if Config.BACKUP_KEEP > 0 else []:
+            try:
+                os.remove(os.path.join(Config.BACKUP_DIR, old))
+            except OSError as e:
+                logger.warning(f"Failed to prune backup {old}: {e}")
+
+        return stats
+
     async def start(self):
         print("🌸 Haruka New is starting...")
 
@@ -58,17 +231,34 @@ class Engine:
         if not sys.stdin.isatty() and not await self._check_session_exists():
             logger.warning("⚠️ Running in headless mode without a session file! Interactive login may fail.")
 
+        # [9] Track tasks per module scope
+        asyncio.get_running_loop().set_task_factory(self._task_factory)
+
         try:
             # 1. Authorization
-            await self.client.start()
+            with self.timeline.span("client.connect"):
+                await self.client.start()
             
-            # 2. Database Connection
-            await self.db.connect()
+            # 2. Database Connection (incl. migrations)
+            with self.timeline.span("db.connect"):
+                await self.db.connect()
+
+            # One-time VACUUM of old databases: before any module can write,
+            # outside connect()'s timeout. Can be postponed via the config flag.
+            if Config.DB_AUTO_VACUUM_MIGRATION:
+                try:
+                    with self.timeline.span("db.auto_vacuum"):
+                        await self.db.enable_auto_vacuum()
+                except Exception as e:
+                    logger.error(f"auto_vacuum migration failed: {e}")
+            elif self.db.needs_auto_vacuum:
+                logger.warning("Database has no incremental auto_vacuum (DB_AUTO_VACUUM_MIGRATION is off).")
             
             # 3. Load Modules with Error Handling
             # [3] Wrapped in try/except
             try:
-                await self.loader.load_all()
+                with self.timeline.span("loader.load_all"):
+                    await self.loader.load_all()
             except Exception as e:
                 logger.error(f"Failed to load plugins: {e}", exc_info=True)
                 # We continue execution even if plugins fail, to allow hot-fix or debug
@@ -76,14 +266,27 @@ class Engine:
             # 4. Start Background Tasks
             # [6] Create task before blocking run
             bg_task = asyncio.create_task(self._background_maintenance())
+            if self.watcher:
+                with self.timeline.span("watcher.start"):
+                    await self.watcher.start()
+            with self.timeline.span("cpu.warmup"):
+                await self.cpu.start()
 
             # User Info Display
-            me = await self.client.get_me()
+            with self.timeline.span("client.get_me"):
+                me = await self.client.get_me()
+            self.timeline.finish()
+            if Config.STARTUP_TRACE:
+                try:
+                    await asyncio.to_thread(self.timeline.write_chrome_trace, Config.STARTUP_TRACE)
+                except OSError as e:
+                    logger.error(f"Failed to write startup trace: {e}")
             info_text = (
                 f"\n✅ Successful login as: {me.first_name} (@{me.username})\n"
                 f"⚡️ Command prefix: {Config.PREFIX}\n"
                 f"📂 Plugins folder: {Config.PLUGINS_DIR}\n"
                 f"💾 Database: {Config.DB_FILE}\n"
+                f"⏱ Startup: {self.timeline.total:.2f}s (.startup for details)\n"
             )
             print(info_text)
             logger.info("Haruka New started successfully.")
@@ -99,6 +302,13 @@ class Engine:
             # Graceful Shutdown
             if 'bg_task' in locals():
                 bg_task.cancel()
+            if self.watcher:
+                await self.watcher.stop()
+            await self.cpu.shutdown()
+            if "system.repo_manager" in sys.modules:
+                # Flushes pending haruka_repos.json changes; not imported at startup
+                await sys.modules["system.repo_manager"].repo_manager.close()
+            await self.http.close()
             
             await self.db.close()
             logger.info("Database connection closed. Goodbye!")
@@ -0,0 +1,162 @@
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Deque, Dict, Optional
+from urllib.parse import urlparse
+from .metrics import percentile
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger("HttpClient")
+
+# Statuses worth another attempt: the server or a proxy is temporarily unhappy
+RETRY_STATUSES = frozenset({500, 502, 503, 504})
+# Only methods that are safe to repeat are retried
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+class _HostStats:
+    __slots__ = ("requests", "errors", "retries", "latencies")
+
+    def __init__(self, window: int):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+class HttpClient:
+    """
+    Shared aiohttp client owned by the Engine (engine.http), also for plugins.
+    One pooled connector (per-host limits, keep-alive, DNS cache), split
+    timeouts, jittered retries for idempotent requests, per-host metrics.
+    aiohttp itself is imported on the first request.
+    """
+
+    def __init__(
+        self,
+        limit: int = 32,
+        limit_per_host: int = 6,
+        dns_ttl: int = 300,
+        keepalive: float = 30,
+        connect_timeout: float = 5,
+        read_timeout: float = 15,
+        total_timeout: float = 60,
+        retries: int = 2,
+        backoff: float = 0.5,
+        window: int = 256,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive = keepalive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.window = window
+
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._hosts: Dict[str, _HostStats] = {}
+
+    async def session(self) -> "aiohttp.ClientSession":
+        """The pooled session (created on first use)."""
+        if self._session is None or self._session.closed:
+            import aiohttp
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=self.total_timeout,
+                sock_connect=self.connect_timeout,
+                sock_read=self.read_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    def _host(self, url: str) -> _HostStats:
+        host = urlparse(url).netloc or "unknown"
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = _HostStats(self.window)
+        return stats
+
+    def _delay(self, attempt: int) -> float:
+        # Full jitter: spreads retries of many concurrent requests apart
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, *, retries: Optional[int] = None, **kwargs: Any) -> AsyncIterator["aiohttp.ClientResponse"]:
+        """
+        async with engine.http.request("GET", url) as resp: ...
+
+        Retries 5xx responses, timeouts and connection errors before the response
+        is handed out (idempotent methods only); reading the body is not retried.
+        """
+        import aiohttp
+
+        method = method.upper()
+        attempts = 1 + (self.retries if retries is None else retries) if method in IDEMPOTENT_METHODS else 1
+        stats = self._host(url)
+        session = await self.session()
+
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            stats.requests += 1
+            started = time.perf_counter()
+            try:
+                resp = await session.request(method, url, **kwargs)
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+                stats.errors += 1
+                if last:
+                    raise
+                stats.retries += 1
+                delay = self._delay(attempt)
+                logger.debug(f"{method} {url} failed ({type(e).__name__}), retry in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            stats.latencies.append(time.perf_counter() - started)
+            if resp.status in RETRY_STATUSES and not last:
+                resp.release()
+                stats.retries += 1
+                delay = self._delay(attempt)
+                logger.debug(f"{method} {url} -> {resp.status}, retry in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            if resp.status >= 500:
+                stats.errors += 1
+
+            try:
+                yield resp
+            finally:
+                resp.release()
+            return
+
+    def summary(self) -> Dict[str, dict]:
+        """host -> {requests, errors, retries, p50, p95, p99} (seconds to response headers)."""
+        result = {}
+        for host, stats in sorted(self._hosts.items(), key=lambda item: -item[1].requests):
+            ordered = sorted(stats.latencies)
+            result[host] = {
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "retries": stats.retries,
+                "p50": percentile(ordered, 50),
+                "p95": percentile(ordered, 95),
+                "p99": percentile(ordered, 99),
+            }
+        return result
+
+    async def close(self):
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            await session.close()
+            logger.info("HTTP client closed.")
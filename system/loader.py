@@ -1,17 +1,39 @@
 import os
 import sys
+import ast
 import importlib.util
 import logging
 import asyncio
 import inspect
+import time
+from typing import Dict, List, Set, Tuple
 from .registry import CommandMeta
 from .config import Config
+from .bytecode import BytecodeCache
+from .manifest import ManifestCache
 
 logger = logging.getLogger("Loader")
 
+class LazyModule:
+    """Placeholder in Registry.modules for a plugin whose body has not run yet."""
+
+    def __init__(self, name: str, path: str, manifest: dict):
+        self.__name__ = name
+        self.__file__ = path
+        self.manifest = manifest
+
+    def __repr__(self):
+        return f"<lazy module '{self.__name__}' from '{self.__file__}'>"
+
 class Loader:
     def __init__(self, engine):
         self.engine = engine
+        self.bytecode = BytecodeCache(os.path.join(Config.CACHE_DIR, "bytecode"))
+        # module_name -> SHA-256 вихідного коду останньої виконаної версії
+        self.hashes: Dict[str, str] = {}
+        self.manifests = ManifestCache(os.path.join(Config.CACHE_DIR, "manifest.json"))
+        # module_name -> задача імпорту ледачого модуля (одна на всіх викликачів)
+        self._lazy_loads: Dict[str, asyncio.Future] = {}
 
     def _exec_module_sync(self, spec, mod):
         """
@@ -20,35 +42,53 @@ class Loader:
         """
         # Додаємо в sys.modules ДО виконання, щоб уникнути циклічних імпортів всередині модуля
         sys.modules[spec.name] = mod
+        started = time.perf_counter()
         try:
-            spec.loader.exec_module(mod)
+            # Замість exec_module: байткод з кешу за SHA-256 вмісту, а не mtime
+            code, digest = self.bytecode.load(spec.origin)
+            exec(code, mod.__dict__)
+            self.hashes[spec.name] = digest
         except Exception as e:
             # Якщо виконання впало, прибираємо з sys.modules, щоб не лишати "битий" модуль
             del sys.modules[spec.name]
             raise e
+        finally:
+            self.engine.timeline.add(spec.name, "import", started, time.perf_counter())
 
-    async def load_file(self, path: str):
+    @staticmethod
+    def _module_name(path: str) -> str:
+        """Визначення імені модуля за шляхом."""
         filename = os.path.basename(path)
-        
-        # Визначення імені модуля
         if "system" in path:
-            name = "system.modules." + filename[:-3]
-        else:
-            name = "plugins." + filename[:-3]
+            return "system.modules." + filename[:-3]
+        return "plugins." + filename[:-3]
+
+    def _prepare(self, path: str):
+        """Створює spec і порожній модуль. Старий модуль прибирається (Hot Reloading)."""
+        name = self._module_name(path)
 
-        # Очистка старого модуля (Hot Reloading)
         if name in sys.modules:
             del sys.modules[name]
 
-        try:
-            spec = importlib.util.spec_from_file_location(name, path)
-            if spec is None or spec.loader is None:
-                raise ImportError(f"Could not load spec for {path}")
+        spec = importlib.util.spec_from_file_location(name, path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Could not load spec for {path}")
 
-            mod = importlib.util.module_from_spec(spec)
+        return name, spec, importlib.util.module_from_spec(spec)
 
-            # 1. Виконуємо тіло модуля в окремому потоці (Fix: блокування)
-            await asyncio.to_thread(self._exec_module_sync, spec, mod)
+    async def _teardown_previous(self, name: str):
+        """
+        Звільняє ресурси попередньої версії модуля перед повторною реєстрацією.
+        Ледача заглушка нічого не тримає, тож її scope переходить до справжнього модуля.
+        """
+        old = self.engine.registry.modules.get(name)
+        if old is not None and not isinstance(old, LazyModule):
+            await self.engine.teardown_module(name, old)
+
+    async def _register(self, name: str, mod) -> Tuple[bool, str]:
+        """Реєструє команди виконаного модуля і викликає його хук register."""
+        try:
+            await self._teardown_previous(name)
 
             cmds = []
             # Збираємо команди
@@ -58,23 +98,25 @@ class Loader:
                     meta.module_name = name
                     cmds.append(meta)
 
-            # Реєструємо команди
-            if cmds:
-                # (Fix: Error Handling) Можна обгорнути це, якщо registry не гарантує безпеку
-                try:
+            # Реєструємо модуль навіть без команд, щоб його можна було вивантажити
+            # (Fix: Error Handling) Можна обгорнути це, якщо registry не гарантує безпеку
+            try:
+                with self.engine.timeline.span(name, "register", commands=len(cmds)):
                     await self.engine.registry.register_module(name, mod, cmds)
-                except Exception as reg_err:
-                    logger.error(f"Registry error in {name}: {reg_err}")
-                    return False, f"Registry failed: {reg_err}"
+            except Exception as reg_err:
+                logger.error(f"Registry error in {name}: {reg_err}")
+                return False, f"Registry failed: {reg_err}"
             
             # 2. Виконання хука register (Fix: async/sync сумісність)
+            # Хендлери і задачі, створені всередині, записуються в scope модуля
             if hasattr(mod, 'register'):
-                if inspect.iscoroutinefunction(mod.register):
-                    await mod.register(self.engine)
-                else:
-                    # Якщо хук синхронний, теж можна винести в thread, якщо він важкий
-                    # Але зазвичай це легка функція налаштування
-                    mod.register(self.engine)
+                with self.engine.scope_for(name).activate(), self.engine.timeline.span(name, "hook"):
+                    if inspect.iscoroutinefunction(mod.register):
+                        await mod.register(self.engine)
+                    else:
+                        # Якщо хук синхронний, теж можна винести в thread, якщо він важкий
+                        # Але зазвичай це легка функція налаштування
+                        mod.register(self.engine)
 
             return True, f"Loaded {len(cmds)} commands"
 
@@ -82,6 +124,188 @@ class Loader:
             logger.error(f"Load Fail [{name}]: {e}", exc_info=True)
             return False, str(e)
 
+    def _make_stub(self, name: str, path: str, command_name: str):
+        """Хендлер-заглушка: імпортує справжній модуль при першому виклику."""
+        async def lazy_stub(ctx):
+            handler = await self._materialize(name, path, command_name)
+            return await handler(ctx)
+
+        lazy_stub.__lazy_stub__ = True
+        return lazy_stub
+
+    async def _register_lazy(self, name: str, path: str, manifest: dict) -> Tuple[bool, str]:
+        """Реєструє команди з маніфесту без виконання тіла модуля."""
+        stubs = [
+            CommandMeta(
+                name=cmd["name"],
+                handler=self._make_stub(name, path, cmd["name"]),
+                module_name=name,
+                aliases=list(cmd["aliases"]),
+                flags=dict(cmd["flags"]),
+                doc=cmd["doc"]
+            )
+            for cmd in manifest["commands"]
+        ]
+        try:
+            await self._teardown_previous(name)
+            with self.engine.timeline.span(name, "register", commands=len(stubs), lazy=True):
+                await self.engine.registry.register_module(name, LazyModule(name, path, manifest), stubs)
+        except Exception as reg_err:
+            logger.error(f"Registry error in {name}: {reg_err}")
+            return False, f"Registry failed: {reg_err}"
+        self.hashes[name] = manifest["sha256"]
+        return True, f"Registered {len(stubs)} lazy commands"
+
+    async def _materialize(self, name: str, path: str, command_name: str):
+        """Імпортує ледачий модуль (один раз) і повертає справжній хендлер команди."""
+        if isinstance(self.engine.registry.modules.get(name), LazyModule):
+            task = self._lazy_loads.get(name)
+            if task is None:
+                logger.info(f"Lazy-loading '{name}' on first use...")
+                task = asyncio.ensure_future(self.load_file(path))
+                self._lazy_loads[name] = task
+                task.add_done_callback(lambda _: self._lazy_loads.pop(name, None))
+            ok, msg = await asyncio.shield(task)
+            if not ok:
+                raise ImportError(f"Failed to load '{name}': {msg}")
+
+        mod = self.engine.registry.modules.get(name)
+        for obj in vars(mod).values() if mod is not None else ():
+            meta = getattr(obj, "haruka_meta", None)
+            if meta is not None and meta.name == command_name:
+                return meta.handler
+        raise LookupError(f"Command '{command_name}' no longer exists in '{name}'")
+
+    async def load_file(self, path: str):
+        name = self._module_name(path)
+
+        try:
+            name, spec, mod = self._prepare(path)
+
+            # 1. Виконуємо тіло модуля в окремому потоці (Fix: блокування)
+            await asyncio.to_thread(self._exec_module_sync, spec, mod)
+
+        except Exception as e:
+            logger.error(f"Load Fail [{name}]: {e}", exc_info=True)
+            return False, str(e)
+
+        return await self._register(name, mod)
+
+    @staticmethod
+    def _dependency_levels(requires: Dict[str, List[str]], satisfied: Set[str]) -> Tuple[List[List[str]], Set[str]]:
+        """
+        Розбиває модулі на рівні (топологічне сортування за __requires__).
+        Всередині рівня — алфавітний порядок, щоб реєстрація була детермінованою.
+        :return: (levels, unresolved) — unresolved: цикли або відсутні залежності.
+        """
+        pending = dict(requires)
+        done = set(satisfied)
+        levels = []
+
+        while pending:
+            level = sorted(n for n, deps in pending.items() if all(d in done for d in deps))
+            if not level:
+                break
+            levels.append(level)
+            for n in level:
+                del pending[n]
+            done.update(level)
+
+        return levels, set(pending)
+
+    async def load_many(self, paths: List[str]) -> Dict[str, Tuple[bool, str]]:
+        """
+        Паралельно завантажує набір файлів.
+        Тіла модулів виконуються в обмеженому пулі потоків рівень за рівнем
+        (залежності з __requires__ — раніше), реєстрація йде послідовно в
+        детермінованому порядку. Падіння одного плагіна не зупиняє інші,
+        лише його залежних.
+        """
+        results: Dict[str, Tuple[bool, str]] = {}
+        if not paths:
+            return results
+
+        by_short = {os.path.basename(p)[:-3]: p for p in paths}
+        with self.engine.timeline.span("loader.manifests", files=len(by_short)):
+            manifest_list = await asyncio.gather(
+                *(asyncio.to_thread(self.manifests.get, p) for p in by_short.values()),
+                return_exceptions=True
+            )
+
+        # Нечитабельний файл (права, видалений після listdir) — помилка лише цього модуля
+        manifests = {}
+        failed: Set[str] = set()
+        for short, manifest in zip(by_short.keys(), manifest_list):
+            if isinstance(manifest, BaseException):
+                name = self._module_name(by_short[short])
+                logger.error(f"Load Fail [{name}]: cannot read file: {manifest}")
+                results[name] = (False, f"Cannot read file: {manifest}")
+                failed.add(short)
+                manifest = {"requires": [], "lazy": False}
+            manifests[short] = manifest
+        requires = {short: m["requires"] for short, m in manifests.items()}
+
+        # Ледачими можуть бути лише плагіни, від яких ніхто не залежить
+        required = {dep for deps in requires.values() for dep in deps}
+        lazy = {
+            short for short, m in manifests.items()
+            if Config.LAZY_PLUGINS and m["lazy"] and short not in required
+            and self._module_name(by_short[short]).startswith("plugins.")
+        }
+
+        # Вже завантажені модулі (напр. з попередньої папки) задовольняють залежності
+        loaded = {m.rsplit(".", 1)[-1] for m in self.engine.registry.modules}
+        levels, unresolved = self._dependency_levels(requires, loaded - set(by_short))
+
+        semaphore = asyncio.Semaphore(Config.LOADER_WORKERS)
+
+        async def execute(short: str):
+            async with semaphore:
+                name, spec, mod = self._prepare(by_short[short])
+                await asyncio.to_thread(self._exec_module_sync, spec, mod)
+                return name, mod
+
+        for level in levels:
+            runnable = []
+            for short in level:
+                if short in failed:
+                    continue  # Вже записано як помилку (файл не прочитався)
+                broken = [d for d in requires[short] if d in failed]
+                if broken:
+                    failed.add(short)
+                    results[self._module_name(by_short[short])] = (False, f"Dependency failed: {', '.join(broken)}")
+                    logger.error(f"Skipping '{short}': dependency failed ({', '.join(broken)})")
+                else:
+                    runnable.append(short)
+
+            eager = [s for s in runnable if s not in lazy]
+            executed = dict(zip(eager, await asyncio.gather(*(execute(s) for s in eager), return_exceptions=True)))
+
+            for short in runnable:
+                name = self._module_name(by_short[short])
+                if short in lazy:
+                    results[name] = await self._register_lazy(name, by_short[short], manifests[short])
+                    continue
+
+                outcome = executed[short]
+                if isinstance(outcome, BaseException):
+                    logger.error(f"Load Fail [{name}]: {outcome}", exc_info=outcome)
+                    results[name] = (False, str(outcome))
+                    failed.add(short)
+                    continue
+
+                results[name] = await self._register(*outcome)
+                if not results[name][0]:
+                    failed.add(short)
+
+        for short in sorted(unresolved):
+            missing = [d for d in requires[short] if d not in by_short and d not in loaded]
+            reason = f"Missing dependency: {', '.join(missing)}" if missing else "Dependency cycle"
+            logger.error(f"Skipping '{short}': {reason}")
+            results[self._module_name(by_short[short])] = (False, reason)
+
+        return results
+
     async def _load_directory(self, directory: str):
         """Допоміжний метод для завантаження папки з сортуванням"""
         if not os.path.exists(directory):
@@ -89,19 +313,25 @@ class Loader:
 
         # 4. Сортування та фільтрація (Fix: порядок та приховані файли)
         files = sorted(os.listdir(directory))
-        
-        for f in files:
-            if f.endswith(".py") and not f.startswith(".") and not f.startswith("__"):
-                full_path = os.path.join(directory, f)
-                await self.load_file(full_path)
+        paths = [
+            os.path.join(directory, f) for f in files
+            if f.endswith(".py") and not f.startswith(".") and not f.startswith("__")
+        ]
+        await self.load_many(paths)
 
     async def load_all(self):
         # 1. System modules
         sys_mod_path = os.path.join(Config.SYSTEM_DIR, "modules")
-        await self._load_directory(sys_mod_path)
+        with self.engine.timeline.span("loader.system_modules"):
+            await self._load_directory(sys_mod_path)
 
         # 2. User plugins
         if not os.path.exists(Config.PLUGINS_DIR):
             os.makedirs(Config.PLUGINS_DIR)
         
-        await self._load_directory(Config.PLUGINS_DIR)
\ No newline at end of file
+        with self.engine.timeline.span("loader.plugins"):
+            await self._load_directory(Config.PLUGINS_DIR)
+
+        await asyncio.to_thread(self.bytecode.prune)
+        await asyncio.to_thread(self.manifests.save)
+        logger.info(f"Bytecode cache: {self.bytecode.hits} hits, {self.bytecode.misses} misses")
\ No newline at end of file
@@ -0,0 +1,204 @@
+import os
+import ast
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("Manifest")
+
+# Bump when the manifest format or scanning rules change
+MANIFEST_VERSION = 1
+
+class _NotLiteral(Exception):
+    pass
+
+def _literal(node: ast.AST) -> Any:
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        raise _NotLiteral(ast.dump(node)[:60])
+
+def _is_command_decorator(node: ast.AST) -> bool:
+    """Matches @command(...) and @<module>.command(...)."""
+    if not isinstance(node, ast.Call):
+        return False
+    func = node.func
+    return (isinstance(func, ast.Name) and func.id == "command") or \
+           (isinstance(func, ast.Attribute) and func.attr == "command")
+
+def _scan_command(func: ast.AST, deco: ast.Call) -> Dict[str, Any]:
+    """Mirrors the argument handling of system.decorators.command."""
+    name = _literal(deco.args[0]) if deco.args else None
+    aliases = _literal(deco.args[1]) if len(deco.args) > 1 else None
+    if len(deco.args) > 2:
+        raise _NotLiteral("too many positional arguments")
+
+    flags = {}
+    for kw in deco.keywords:
+        if kw.arg is None:
+            raise _NotLiteral("**kwargs")
+        if kw.arg == "name":
+            name = _literal(kw.value)
+        elif kw.arg == "aliases":
+            aliases = _literal(kw.value)
+        else:
+            flags[kw.arg] = _literal(kw.value)
+
+    return {
+        "name": (name or func.name).strip(),
+        "aliases": list(aliases) if aliases else [],
+        "flags": flags,
+        "doc": ast.get_docstring(func) or "",
+    }
+
+def scan_source(source: bytes, path: str) -> Dict[str, Any]:
+    """
+    Statically extracts commands and metadata from a plugin without executing it.
+
+    A plugin is lazy-capable only if every @command is a top-level function
+    with literal arguments, it has no register() hook and does not opt out
+    with `__lazy__ = False`.
+    """
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "requires": [],
+        "commands": [],
+        "lazy": False,
+        "reason": "",
+    }
+
+    try:
+        tree = ast.parse(source, filename=path)
+    except (SyntaxError, ValueError):
+        # The real import reports the error properly
+        manifest["reason"] = "syntax error"
+        return manifest
+
+    top_level_decorators = 0
+    lazy_opt = True
+    has_register = False
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if node.name == "register":
+                has_register = True
+            for deco in node.decorator_list:
+                if _is_command_decorator(deco):
+                    top_level_decorators += 1
+                    try:
+                        manifest["commands"].append(_scan_command(node, deco))
+                    except _NotLiteral as e:
+                        manifest["reason"] = f"non-literal @command argument in '{node.name}' ({e})"
+
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if not isinstance(target, ast.Name):
+                    continue
+                if target.id == "register":
+                    has_register = True
+                elif target.id in ("__requires__", "__lazy__"):
+                    try:
+                        value = _literal(node.value)
+                    except _NotLiteral:
+                        logger.warning(f"{path}: {target.id} must be a literal")
+                        continue
+                    if target.id == "__lazy__":
+                        lazy_opt = bool(value)
+                    else:
+                        if isinstance(value, str):
+                            value = [value]
+                        manifest["requires"] = [str(dep).rsplit(".", 1)[-1] for dep in value]
+
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            if any((alias.asname or alias.name) == "register" for alias in node.names):
+                has_register = True
+
+    # Commands hidden in conditionals, classes or factories cannot be stubbed safely
+    all_decorators = sum(
+        1 for node in ast.walk(tree)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+        for deco in node.decorator_list if _is_command_decorator(deco)
+    )
+
+    if manifest["reason"]:
+        pass
+    elif not lazy_opt:
+        manifest["reason"] = "__lazy__ = False"
+    elif has_register:
+        manifest["reason"] = "has register() hook"
+    elif not manifest["commands"]:
+        manifest["reason"] = "no commands"
+    elif all_decorators != top_level_decorators:
+        manifest["reason"] = "nested @command declarations"
+    else:
+        manifest["lazy"] = True
+
+    return manifest
+
+class ManifestCache:
+    """
+    Plugin manifests cached on disk by source SHA-256.
+    Safe to call get() from loader worker threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Optional[Dict[str, dict]] = None
+        self._used: set = set()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        self._entries = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self._entries = data.get("entries", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring broken manifest cache: {e}")
+
+    def get(self, path: str) -> Dict[str, Any]:
+        """Manifest for a file (with its 'sha256'), scanning only on a miss."""
+        with open(path, "rb") as f:
+            source = f.read()
+        digest = hashlib.sha256(source).hexdigest()
+
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            cached = self._entries.get(digest)
+            self._used.add(digest)
+
+        if cached is None:
+            cached = scan_source(source, path)
+            with self._lock:
+                self._entries[digest] = cached
+                self._dirty = True
+
+        return dict(cached, sha256=digest)
+
+    def save(self):
+        """Writes the cache atomically, dropping entries unused in this run."""
+        with self._lock:
+            if self._entries is None:
+                return
+            stale = set(self._entries) - self._used
+            if not self._dirty and not stale:
+                return
+            entries = {k: v for k, v in self._entries.items() if k in self._used}
+            self._entries = entries
+            self._dirty = False
+
+        tmp = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to save manifest cache: {e}")
@@ -0,0 +1,193 @@
+import sys
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+logger = logging.getLogger("Metrics")
+
+# Frames from these modules are skipped when looking for the calling module
+_INTERNAL_MODULES = ("system.database", "system.metrics", "asyncio", "contextlib")
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile over an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def percentiles(values) -> Dict[str, float]:
+    """{p50, p95, p99} of an unsorted collection."""
+    ordered = sorted(values)
+    return {
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+    }
+
+def key_prefix(key: Optional[str]) -> str:
+    """'cute_mode_enabled' -> 'cute', 'notes:42' -> 'notes'."""
+    if not key:
+        return ""
+    for i, ch in enumerate(key):
+        if ch in ":._":
+            return key[:i]
+    return key[:32]
+
+def find_caller() -> str:
+    """Name of the first module on the stack outside the database layer."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        name = frame.f_globals.get("__name__", "")
+        if not name.startswith(_INTERNAL_MODULES):
+            return name
+        frame = frame.f_back
+    return "unknown"
+
+@dataclass
+class SlowOp:
+    timestamp: float
+    op: str
+    total: float
+    phases: Dict[str, float]
+    key_prefix: str
+    caller: str
+
+class OpTiming:
+    """
+    Lap-based timer for one database operation.
+    Each lap() charges the time since the previous lap to a phase.
+    """
+    __slots__ = ("stats", "op", "key", "started", "skipped", "_last", "phases")
+
+    def __init__(self, stats: "DatabaseStats", op: str, key: Optional[str] = None):
+        self.stats = stats
+        self.op = op
+        self.key = key
+        self.started = self._last = time.perf_counter()
+        self.skipped = 0.0
+        self.phases: Dict[str, float] = {}
+
+    def lap(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - self._last)
+        self._last = now
+
+    def skip(self):
+        """Discards the time since the last lap (e.g. deliberate sleeps)."""
+        now = time.perf_counter()
+        self.skipped += now - self._last
+        self._last = now
+
+    def done(self, failed: bool = False):
+        self.stats.record(self, failed)
+
+@dataclass
+class _OpSeries:
+    count: int = 0
+    errors: int = 0
+    totals: Deque[float] = field(default_factory=deque)
+    phases: Dict[str, Deque[float]] = field(default_factory=dict)
+
+class DatabaseStats:
+    """Rolling per-operation timings plus a slow-operation log."""
+
+    def __init__(self, slow_threshold: float = 0.1, window: int = 1024, slow_log_size: int = 100):
+        self.slow_threshold = slow_threshold
+        self.window = window
+        self.slow_log: Deque[SlowOp] = deque(maxlen=slow_log_size)
+        self._series: Dict[str, _OpSeries] = {}
+
+    def begin(self, op: str, key: Optional[str] = None) -> OpTiming:
+        return OpTiming(self, op, key)
+
+    def record(self, timing: OpTiming, failed: bool = False):
+        total = time.perf_counter() - timing.started - timing.skipped
+
+        series = self._series.get(timing.op)
+        if series is None:
+            series = self._series[timing.op] = _OpSeries(totals=deque(maxlen=self.window))
+        series.count += 1
+        if failed:
+            series.errors += 1
+        series.totals.append(total)
+        for phase, value in timing.phases.items():
+            values = series.phases.get(phase)
+            if values is None:
+                values = series.phases[phase] = deque(maxlen=self.window)
+            values.append(value)
+
+        # Stack walk only for slow operations, the fast path stays cheap
+        if total >= self.slow_threshold:
+            entry = SlowOp(
+                timestamp=time.time(),
+                op=timing.op,
+                total=total,
+                phases=dict(timing.phases),
+                key_prefix=key_prefix(timing.key),
+                caller=find_caller()
+            )
+            self.slow_log.append(entry)
+            logger.warning(
+                f"Slow DB op '{entry.op}' {total * 1000:.1f}ms "
+                f"(key={entry.key_prefix or '-'}, caller={entry.caller}, "
+                + ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in entry.phases.items()) + ")"
+            )
+
+    def summary(self) -> Dict[str, dict]:
+        """op -> {count, errors, total: {p50, p95, p99}, phases: {phase: {p50, p95, p99}}}"""
+        result = {}
+        for op, series in sorted(self._series.items()):
+            result[op] = {
+                "count": series.count,
+                "errors": series.errors,
+                "total": percentiles(series.totals),
+                "phases": {phase: percentiles(values) for phase, values in series.phases.items()},
+            }
+        return result
+
+    def reset(self):
+        self._series.clear()
+        self.slow_log.clear()
+
+@dataclass
+class _CommandSeries:
+    count: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    durations: Deque[float] = field(default_factory=deque)
+
+class CommandStats:
+    """Rolling per-command-path timings ('ping', 'haruka install'), kept by the dispatcher."""
+
+    def __init__(self, window: int = 256):
+        self.window = window
+        self._series: Dict[str, _CommandSeries] = {}
+
+    def record(self, path: str, seconds: float, status: str = "ok"):
+        """status: 'ok', 'error' or 'timeout'."""
+        series = self._series.get(path)
+        if series is None:
+            series = self._series[path] = _CommandSeries(durations=deque(maxlen=self.window))
+        series.count += 1
+        if status == "error":
+            series.errors += 1
+        elif status == "timeout":
+            series.timeouts += 1
+        series.durations.append(seconds)
+
+    def summary(self) -> Dict[str, dict]:
+        """path -> {count, errors, timeouts, p50, p95, p99}, busiest first."""
+        result = {}
+        for path, series in sorted(self._series.items(), key=lambda item: -item[1].count):
+            result[path] = {
+                "count": series.count,
+                "errors": series.errors,
+                "timeouts": series.timeouts,
+                **percentiles(series.durations),
+            }
+        return result
+
+    def reset(self):
+        self._series.clear()
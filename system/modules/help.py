@@ -1,4 +1,42 @@
 from system.decorators import command
+from system.registry import normalize_trigger
+
+def _short(module_name: str) -> str:
+    return module_name.split('.')[-1] # plugins.ping -> ping
+
+def _render_overview(snap) -> str:
+    """Module list for .help (cached by the registry until any module changes)."""
+    modules = {}
+    # Group commands by short module name (module_commands has no alias duplicates)
+    for module_name, cmds in snap.module_commands.items():
+        if cmds:
+            modules.setdefault(_short(module_name), []).extend(cmd.name for cmd in cmds)
+
+    text = (
+        f"🌸 <b>Haruka Help</b>\n"
+        f"Modules: {len(modules)} | Commands: {len(snap.commands)}\n"
+        f"━━━━━━━━━━━━━━━━━━━━\n"
+    )
+
+    for mod, cmds in sorted(modules.items()):
+        # Sort commands and show first 4 + ...
+        preview = ", ".join(sorted(cmds)[:4])
+        if len(cmds) > 4: preview += "..."
+
+        text += f"📦 <b>{mod}:</b> <code>{preview}</code>\n"
+
+    text += "\nℹ️ Write <code>.help name</code> for details."
+    return text
+
+def _module_renderer(module_name: str):
+    def render(snap) -> str:
+        cmds = snap.module_commands.get(module_name, ())
+        return (
+            f"📦 <b>Module:</b> {_short(module_name)}\n"
+            f"━━━━━━━━━━━━━━━━━━━━\n"
+            f"{', '.join(f'<code>.{cmd.name}</code>' for cmd in cmds)}"
+        )
+    return render
 
 @command("help", aliases=["h"])
 async def help_cmd(ctx):
@@ -10,67 +48,57 @@ async def help_cmd(ctx):
     
     # 1. If no arguments - show module list
     if not ctx.args:
-        modules = {}
-        # Group commands by modules
-        for name, cmd in registry.commands.items():
-            mod_name = cmd.module_name.split('.')[-1] # plugins.ping -> ping
-            if mod_name not in modules:
-                modules[mod_name] = []
-            if name not in modules[mod_name]: # Avoid alias duplicates
-                modules[mod_name].append(name)
-
-        count_mods = len(modules)
-        count_cmds = len(registry.commands)
-        
-        text = (
-            f"🌸 <b>Haruka Help</b>\n"
-            f"Modules: {count_mods} | Commands: {count_cmds}\n"
-            f"━━━━━━━━━━━━━━━━━━━━\n"
-        )
-        
-        for mod, cmds in sorted(modules.items()):
-            # Sort commands and show first 3 + count
-            preview = ", ".join(sorted(cmds)[:4])
-            if len(cmds) > 4: preview += "..."
-            
-            text += f"📦 <b>{mod}:</b> <code>{preview}</code>\n"
-            
-        text += "\nℹ️ Write <code>.help name</code> for details."
-        await ctx.respond(text)
+        await ctx.respond(registry.cached_page(None, _render_overview))
         return
 
     # 2. If there's an argument - search for module or command
-    query = ctx.args[0].lower()
+    query = normalize_trigger(ctx.args[0])
+    snap = registry.snapshot
 
-    # A) Search for command
-    if query in registry.commands:
-        cmd = registry.commands[query]
+    # A) Search for command ('.help haruka install' -> subcommand)
+    cmd = snap.commands.get(query)
+    if cmd and len(ctx.args) > 1 and cmd.key in snap.groups:
+        cmd = snap.commands.get(f"{cmd.key} {normalize_trigger(ctx.args[1])}", cmd)
+    if cmd:
         aliases = ", ".join(cmd.aliases) if cmd.aliases else "None"
         text = (
             f"📑 <b>Command:</b> <code>.{cmd.name}</code>\n"
             f"📦 <b>Module:</b> {cmd.module_name}\n"
             f"🔗 <b>Aliases:</b> {aliases}\n"
-            f"📝 <b>Description:</b>\n{cmd.doc.strip()}"
+            f"📝 <b>Description:</b>\n{cmd.doc.strip() or 'No description.'}"
         )
+        if cmd.key in snap.groups:
+            subs = ", ".join(f"<code>{sub.name.split(' ', 1)[1]}</code>" for sub in snap.subcommands(cmd.key))
+            text += f"\n🧩 <b>Subcommands:</b> {subs}"
         await ctx.respond(text)
         return
 
-    # B) Search for module
-    # (Need to go through all commands and find those belonging to the module)
-    found_cmds = []
-    for name, cmd in registry.commands.items():
-        if query in cmd.module_name:
-            found_cmds.append(f"<code>.{name}</code>")
-    
-    # Remove duplicates (due to aliases)
-    found_cmds = sorted(list(set(found_cmds)))
+    # B) Search for module: exact short name first, then any name containing the query
+    found = [m for m, cmds in snap.module_commands.items() if cmds and _short(m) == query]
+    if not found:
+        found = sorted(m for m, cmds in snap.module_commands.items() if cmds and query in m)
 
-    if found_cmds:
-        text = (
-            f"📦 <b>Module:</b> {query}\n"
-            f"━━━━━━━━━━━━━━━━━━━━\n"
-            f"{', '.join(found_cmds)}"
-        )
-        await ctx.respond(text)
+    if found:
+        pages = [registry.cached_page(m, _module_renderer(m)) for m in found]
+        await ctx.respond("\n\n".join(pages))
+    else:
+        await ctx.err(f"Nothing found for query <b>{ctx.escape(query)}</b>")
+
+
+@command("suggest")
+async def suggest_toggle(ctx):
+    """
+    Turns "did you mean" hints for mistyped commands on or off in this chat.
+    Usage: .suggest on | .suggest off
+    """
+    key = f"suggest_off:{ctx.event.chat_id}"
+    if not ctx.args or ctx.args[0].lower() not in ("on", "off"):
+        state = "off" if await ctx.db.get(key, False) else "on"
+        return await ctx.respond(f"💡 Command suggestions are <b>{state}</b> in this chat.\nUsage: <code>.suggest on|off</code>")
+
+    if ctx.args[0].lower() == "off":
+        await ctx.db.set(key, True)
+        await ctx.ok("Command suggestions disabled in this chat.")
     else:
-        await ctx.err(f"Nothing found for query <b>{query}</b>")
\ No newline at end of file
+        await ctx.db.delete(key)
+        await ctx.ok("Command suggestions enabled in this chat.")
@@ -1,3 +1,4 @@
+import asyncio
 import time
 import sys
 import os
@@ -131,4 +132,96 @@ async def set_pfp(ctx):
         
         await ctx.ok("Profile picture updated! ✨")
     except Exception as e:
-        await ctx.err(f"Error: {e}")
\ No newline at end of file
+        await ctx.err(f"Error: {e}")
+
+# --- STARTUP PROFILE ---
+
+@command("startup", aliases=["boot"])
+async def startup_profile(ctx):
+    """
+    Shows how long startup took: phases and the slowest modules.
+    Usage: .startup or .startup trace (sends a Chrome trace JSON)
+    """
+    timeline = ctx.engine.timeline
+
+    if ctx.args and ctx.args[0].lower() == "trace":
+        path = os.path.join(Config.CACHE_DIR, "startup-trace.json")
+        try:
+            await asyncio.to_thread(timeline.write_chrome_trace, path)
+        except OSError as e:
+            return await ctx.err(f"Failed to write trace: {e}")
+        await ctx.client.send_file(
+            ctx.event.chat_id,
+            path,
+            caption="⏱ Startup trace (open in chrome://tracing or ui.perfetto.dev)"
+        )
+        return
+
+    text = f"⏱ <b>Startup:</b> <code>{timeline.total:.2f}s</code>\n━━━━━━━━━━━━━━━━━━━━\n"
+    for span in timeline.phases():
+        text += f"┣ {span.name}: <code>{span.duration * 1000:.0f}ms</code>\n"
+
+    modules = timeline.modules()[:10]
+    if modules:
+        text += "\n🐢 <b>Slowest modules</b> (import/register/hook, ms)\n"
+        for entry in modules:
+            text += (
+                f"• <b>{ctx.escape(entry['name'])}</b> {entry['total'] * 1000:.0f}ms "
+                f"<code>{entry.get('import', 0) * 1000:.0f}/"
+                f"{entry.get('register', 0) * 1000:.0f}/"
+                f"{entry.get('hook', 0) * 1000:.0f}</code>\n"
+            )
+
+    await ctx.respond(text)
+
+
+@command("cmdstats", aliases=["cs"])
+async def command_stats(ctx):
+    """
+    Shows command timings per command path (p50/p95/p99 in ms).
+    Usage: .cmdstats or .cmdstats reset
+    """
+    stats = ctx.engine.dispatcher.stats
+
+    if ctx.args and ctx.args[0].lower() == "reset":
+        stats.reset()
+        return await ctx.ok("Command statistics reset.")
+
+    summary = stats.summary()
+    if not summary:
+        return await ctx.warn("No commands recorded yet.")
+
+    text = "📊 <b>Command timings</b> (ms, p50/p95/p99)\n━━━━━━━━━━━━━━━━━━━━\n"
+    for path, data in list(summary.items())[:20]:
+        failures = []
+        if data["errors"]:
+            failures.append(f"{data['errors']} err")
+        if data["timeouts"]:
+            failures.append(f"{data['timeouts']} timeout")
+        text += (
+            f"<b>.{ctx.escape(path)}</b> ×{data['count']}"
+            + (f" ({', '.join(failures)})" if failures else "")
+            + f": <code>{data['p50'] * 1000:.0f}/{data['p95'] * 1000:.0f}/{data['p99'] * 1000:.0f}</code>\n"
+        )
+
+    await ctx.respond(text)
+
+
+@command("netstats", aliases=["ns"])
+async def net_stats(ctx):
+    """
+    Shows HTTP client statistics per host (latency to response headers, ms).
+    Usage: .netstats
+    """
+    summary = ctx.http.summary()
+    if not summary:
+        return await ctx.warn("No HTTP requests made yet.")
+
+    text = "🌐 <b>HTTP per host</b> (ms, p50/p95/p99)\n━━━━━━━━━━━━━━━━━━━━\n"
+    for host, data in summary.items():
+        text += (
+            f"<b>{ctx.escape(host)}</b> ×{data['requests']}"
+            + (f" ({data['errors']} err, {data['retries']} retries)" if data["errors"] or data["retries"] else "")
+            + f": <code>{data['p50'] * 1000:.0f}/{data['p95'] * 1000:.0f}/{data['p99'] * 1000:.0f}</code>\n"
+        )
+    await ctx.respond(text)
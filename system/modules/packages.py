@@ -1,7 +1,8 @@
 import os
 import asyncio
+from typing import Optional
 from system.decorators import command
-from system.repo_manager import repo_manager
+from system.repo_manager import repo_manager, DownloadError
 from system.config import Config
 
 @command("add", aliases=["install"])
@@ -83,182 +84,335 @@ async def update_plugin(ctx):
         return await ctx.err("Specify module name to update or use .haruka update for all.")
         
     name = ctx.args[0]
-    url = repo_manager.get_installed_url(name)
+    record = repo_manager.get_installed(name)
     
-    if not url:
+    if not record:
         return await ctx.err(f"Module <b>{name}</b> was installed manually. Update it via .add (reply) or delete and install from repo.")
         
     await ctx.warn(f"🔄 Updating <b>{name}</b> from cloud...")
-    content = await repo_manager.fetch_file(url)
-    
-    if not content:
-        return await ctx.err("Failed to download file. Source link might be dead.")
-        
-    path = os.path.join(Config.PLUGINS_DIR, f"{name}.py")
-    with open(path, "wb") as f:
-        f.write(content)
-        
-    ok, msg = await ctx.engine.loader.load_file(path)
+    state, detail = await _fetch_update(ctx, name, record)
+
+    if state == "failed":
+        return await ctx.err(f"Update error: {detail}")
+    if state == "unchanged":
+        return await ctx.ok(f"Module <b>{name}</b> is already up to date.")
+
+    ok, msg = await _apply_update(ctx, name, record["url"], *detail)
     if ok:
         await ctx.ok(f"Module <b>{name}</b> updated successfully!")
     else:
         await ctx.err(f"Update error: {msg}")
 
+def register(engine):
+    # Repo requests go through the engine's pooled client, closed on shutdown
+    repo_manager.attach(engine.http)
+
+async def unregister(engine):
+    # Відкладений запис haruka_repos.json не має загубитись при перезавантаженні модуля
+    await repo_manager.flush()
+
 # === HARUKA PACKAGE MANAGER SYSTEM ===
+# `.haruka` itself is an implicit group command: it lists the subcommands below.
+
+def _repo_short(repo: str) -> str:
+    parts = repo.split("/")
+    return parts[-2] if len(parts) > 2 else repo
 
-@command("haruka")
-async def haruka_manager(ctx):
+async def _search_repos(repos, target_name: str, stop_at_first: bool = False, index_max_age: Optional[float] = None):
     """
-    Haruka package manager.
-    .haruka add <link> — Add repository (raw github link)
-    .haruka install <name> — Install plugin from added repos
-    .haruka list — List connected repositories
-    .haruka update — Check updates for all repo-installed plugins
+    Шукає <target_name>.py у репозиторіях. Репозиторії з index.json відповідають
+    з локального індексу, решта паралельно перевіряється HEAD-запитом (без тіла).
+    Зупиняється, щойно результат відомий: другий збіг (неоднозначність) або,
+    з stop_at_first, перший збіг з урахуванням порядку репозиторіїв.
+    :param index_max_age: Вік кешу індексів; 0 — умовний GET зараз (зазвичай 304).
+    :return: ([(repo, url, index_entry | None), ...] у порядку repos, текст звіту)
     """
-    if not ctx.args:
-        return await ctx.respond(
-            "📦 <b>Haruka Package Manager</b>\n"
-            "<code>.haruka add (link)</code> - Add repository\n"
-            "<code>.haruka install (name)</code> - Install plugin\n"
-            "<code>.haruka list</code> - List of repositories\n"
-            "<code>.haruka update</code> - Update all installed"
-        )
-    
-    subcmd = ctx.args[0].lower()
+    indexes = await repo_manager.get_indexes(repos, max_age=index_max_age)
+    entries = [(indexes[repo] or {}).get(target_name) for repo in repos]
+    urls = [repo_manager.plugin_url(repo, target_name, entry) for repo, entry in zip(repos, entries)]
+
+    # index -> (found, seconds, note); відповіді з індексу відомі одразу
+    results = {
+        i: (entries[i] is not None, 0.0, "index")
+        for i, repo in enumerate(repos) if indexes[repo] is not None
+    }
+
+    def decided() -> bool:
+        hits = sorted(i for i, (found, _, _) in results.items() if found)
+        if not stop_at_first:
+            return len(hits) > 1
+        # Перший збіг виграє, лише коли всі репозиторії перед ним відповіли
+        return bool(hits) and all(i in results for i in range(hits[0]))
+
+    semaphore = asyncio.Semaphore(Config.REPO_SEARCH_CONCURRENCY)
+
+    async def check(index: int):
+        async with semaphore:
+            return index, await repo_manager.probe(urls[index])
+
+    tasks = [] if decided() else [asyncio.create_task(check(i)) for i in range(len(repos)) if i not in results]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            results[index] = result
+            if decided():
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    lines = []
+    for i, repo in enumerate(repos):
+        if i not in results:
+            lines.append(f"⏭ <code>{_repo_short(repo)}</code> skipped")
+            continue
+        found, seconds, note = results[i]
+        icon = "✅" if found else ("⚠️" if found is None else "▫️")
+        timing = "" if note == "index" else f" {seconds * 1000:.0f}ms"
+        lines.append(f"{icon} <code>{_repo_short(repo)}</code>{timing} ({note})")
+
+    found_in = [(repos[i], urls[i], entries[i]) for i in sorted(results) if results[i][0]]
+    if stop_at_first:
+        found_in = found_in[:1]
+    return found_in, "\n".join(lines)
+
+@command("haruka add")
+async def haruka_add(ctx):
+    """
+    Add repository (raw github link).
+    Usage: .haruka add <link>
+    """
+    if not ctx.args: 
+        return await ctx.err("Specify GitHub link (Raw or folder URL)!")
     
-    # --- ADD REPO ---
-    if subcmd == "add":
-        if len(ctx.args) < 2: 
-            return await ctx.err("Specify GitHub link (Raw or folder URL)!")
-        
-        url = ctx.args[1]
-        # Проста нормалізація URL (якщо юзер кинув посилання на дерево файлів, а не raw)
-        if "github.com" in url and "raw.githubusercontent.com" not in url:
-             url = url.replace("github.com", "raw.githubusercontent.com").replace("/blob/", "/")
+    url = ctx.args[0]
+    # Проста нормалізація URL (якщо юзер кинув посилання на дерево файлів, а не raw)
+    if "github.com" in url and "raw.githubusercontent.com" not in url:
+         url = url.replace("github.com", "raw.githubusercontent.com").replace("/blob/", "/")
 
-        if repo_manager.add_repo(url):
-            await ctx.ok(f"Repository added!\n🔗 {url}")
-        else:
-            await ctx.warn("This repository is already in the list.")
-
-    # --- LIST REPOS ---
-    elif subcmd == "list":
-        repos = repo_manager.get_all_repos()
-        if not repos: 
-            return await ctx.warn("Repository list is empty.")
-        text = "🔗 <b>Connected repositories:</b>\n" + "\n".join([f"• {r}" for r in repos])
-        await ctx.respond(text)
-
-    # --- INSTALL PLUGIN ---
-    elif subcmd == "install":
-        if len(ctx.args) < 2: 
-            return await ctx.err("Specify plugin name!")
-        
-        target_name = ctx.args[1]
-        if target_name.endswith(".py"): 
-            target_name = target_name[:-3]
+    if repo_manager.add_repo(url):
+        await ctx.ok(f"Repository added!\n🔗 {url}")
+    else:
+        await ctx.warn("This repository is already in the list.")
 
-        specific_repo = None
-        
-        # Підтримка синтаксису "install name repo:author"
-        if "repo:" in " ".join(ctx.args):
-            for arg in ctx.args:
-                if arg.startswith("repo:"):
-                    specific_repo = arg.split(":")[1]
-                    target_name = target_name.replace(f" {arg}", "").strip() 
-                    
-        status = await ctx.warn(f"🔎 Searching for <b>{target_name}.py</b>...")
-        
-        repos = repo_manager.get_all_repos()
-        found_in = []
-        
-        # Пошук файлу по всіх репозиторіях
-        for repo in repos:
-            if specific_repo and specific_repo.lower() not in repo.lower():
-                continue
+@command("haruka list")
+async def haruka_list(ctx):
+    """
+    List connected repositories.
+    Usage: .haruka list
+    """
+    repos = repo_manager.get_all_repos()
+    if not repos: 
+        return await ctx.warn("Repository list is empty.")
+    text = "🔗 <b>Connected repositories:</b>\n" + "\n".join([f"• {r}" for r in repos])
+    await ctx.respond(text)
+
+@command("haruka install", timeout=600)
+async def haruka_install(ctx):
+    """
+    Install plugin from added repos.
+    Usage: .haruka install <name> [repo:PartialName]
+    """
+    if not ctx.args: 
+        return await ctx.err("Specify plugin name!")
+    
+    target_name = ctx.args[0]
+    if target_name.endswith(".py"): 
+        target_name = target_name[:-3]
+
+    specific_repo = None
+    
+    # Підтримка синтаксису "install name repo:author"
+    for arg in ctx.args[1:]:
+        if arg.startswith("repo:"):
+            specific_repo = arg.split(":", 1)[1]
                 
-            # Формуємо URL (припускаємо структуру raw-репо)
-            check_url = f"{repo}/{target_name}.py".replace("//", "/").replace("https:/", "https://")
-            
-            # Перевіряємо наявність (качаємо контент)
-            content = await repo_manager.fetch_file(check_url)
-            if content:
-                found_in.append((repo, check_url, content))
+    # Статус-повідомлення: далі редагується зі звітом по репозиторіях
+    status = await ctx.respond(f"🔎 Searching for <b>{ctx.escape(target_name)}.py</b>...")
+    
+    repos = [r for r in repo_manager.get_all_repos()
+             if not specific_repo or specific_repo.lower() in r.lower()]
+    # Свіжі індекси: інакше щойно опублікований плагін "не знайдено", а нова версія
+    # не пройде перевірку хешу зі старого кешу
+    found_in, report = await _search_repos(repos, target_name, stop_at_first=bool(specific_repo), index_max_age=0)
 
-        if not found_in:
-            return await status.edit(f"❌ Plugin <b>{target_name}</b> not found in connected repos.")
-            
-        # Якщо знайдено більше 1 версії і не вказано конкретний репо
-        if len(found_in) > 1 and not specific_repo:
-            text = f"⚠️ <b>Found multiple versions of '{target_name}':</b>\n"
-            for r, _, _ in found_in:
-                repo_short = r.split("/")[-2] if len(r.split("/")) > 2 else r
-                text += f"• In: <code>{repo_short}</code>\n"
-            text += f"\nSpecify: <code>.haruka install {target_name} repo:PartialName</code>"
-            return await status.edit(text)
-
-        # Встановлення
-        repo_url, dl_url, content = found_in[0]
-        path = os.path.join(Config.PLUGINS_DIR, f"{target_name}.py")
+    if not found_in:
+        return await status.edit(f"❌ Plugin <b>{target_name}</b> not found in connected repos.\n\n{report}", parse_mode="html")
         
-        with open(path, "wb") as f:
-            f.write(content)
-            
-        ok, msg = await ctx.engine.loader.load_file(path)
+    # Якщо знайдено більше 1 версії і не вказано конкретний репо
+    if len(found_in) > 1 and not specific_repo:
+        text = f"⚠️ <b>Found multiple versions of '{target_name}':</b>\n"
+        for r, _, _ in found_in:
+            text += f"• In: <code>{_repo_short(r)}</code>\n"
+        text += f"\nSpecify: <code>.haruka install {target_name} repo:PartialName</code>\n\n{report}"
+        return await status.edit(text, parse_mode="html")
+
+    # Качаємо тіло лише з репозиторію-переможця: потоково, з перевіркою хешу з індексу
+    repo_url, dl_url, entry = found_in[0]
+    path = os.path.join(Config.PLUGINS_DIR, f"{target_name}.py")
+    try:
+        download = await repo_manager.download(
+            dl_url, path,
+            expected_sha256=(entry or {}).get("sha256"),
+            keep_previous=True,
+        )
+    except DownloadError as e:
+        return await status.edit(f"❌ Failed to download <b>{target_name}</b> from <code>{repo_url}</code>: {ctx.escape(e)}", parse_mode="html")
+
+    # Встановлення
+    ok, msg = await _apply_update(ctx, target_name, dl_url, path, download)
+    if ok:
+        await status.edit(f"✅ Installed <b>{target_name}</b> from <code>{repo_url}</code>\n\n{report}", parse_mode="html")
+    else:
+        await status.edit(f"❌ Loading error: {ctx.escape(msg)}", parse_mode="html")
+
+@command("haruka search", aliases=["find"])
+async def haruka_search(ctx):
+    """
+    Search plugins in the index.json of connected repos.
+    Usage: .haruka search <text>
+    """
+    query = ctx.input.strip().lower()
+    if not query:
+        return await ctx.err("Specify what to search for!")
+
+    repos = repo_manager.get_all_repos()
+    indexes = await repo_manager.get_indexes(repos)
+
+    matches = []
+    for repo, plugins in indexes.items():
+        for name, entry in (plugins or {}).items():
+            if query in name.lower() or query in str(entry.get("description", "")).lower():
+                matches.append((name, entry, repo))
+
+    without_index = sum(1 for plugins in indexes.values() if plugins is None)
+    # Без розмітки: note іде і в ctx.warn (екранує сам), і в HTML-список нижче
+    note = f"\n\nℹ️ {without_index} repo(s) have no index.json and were not searched." if without_index else ""
+
+    if not matches:
+        return await ctx.warn(f"Nothing found for '{query}'.{note}")
+
+    text = f"🔎 <b>Found {len(matches)} plugin(s):</b>\n"
+    for name, entry, repo in sorted(matches, key=lambda m: m[0])[:30]:
+        version = f" v{ctx.escape(entry['version'])}" if entry.get("version") else ""
+        description = f" — {ctx.escape(entry['description'])}" if entry.get("description") else ""
+        text += f"• <code>{ctx.escape(name)}</code>{version}{description} (<code>{_repo_short(repo)}</code>)\n"
+    text += f"\nInstall: <code>.haruka install name</code>{note}"
+    await ctx.respond(text)
+
+def _update_repo(url: str) -> str:
+    return url.rsplit("/", 1)[0]
+
+async def _fetch_update(ctx, name: str, record: dict, index_max_age: Optional[float] = 0):
+    """
+    Завантажує нову версію плагіна і, якщо вміст змінився, атомарно пише її на диск.
+    Якщо index.json репозиторію знає SHA-256 і він збігається з встановленим,
+    файл навіть не завантажується.
+    :param index_max_age: Вік кешу індексу; 0 — перевірити індекс зараз (умовний GET),
+        інакше хеш зі старого кешу відхилить щойно опубліковану версію.
+    :return: ("unchanged", None) | ("changed", (path, Download)) | ("failed", reason)
+    """
+    url = record["url"]
+    path = os.path.join(Config.PLUGINS_DIR, f"{name}.py")
+    # Хеш того, що зараз працює: з запису, інакше з лоадера, інакше з файлу
+    installed_sha = record.get("sha256") or ctx.engine.loader.hashes.get(f"plugins.{name}")
+
+    index = await repo_manager.get_index(_update_repo(url), index_max_age)
+    expected = ((index or {}).get(name) or {}).get("sha256")
+    if expected and installed_sha and expected == installed_sha and os.path.exists(path):
+        return "unchanged", None
+
+    try:
+        download = await repo_manager.download(
+            url, path,
+            expected_sha256=expected,
+            unchanged_sha256=installed_sha,
+            keep_previous=True,
+        )
+    except DownloadError as e:
+        return "failed", str(e)
+
+    if not download.changed:
+        if record.get("sha256") != download.sha256:
+            repo_manager.record_install(name, url, download.sha256)
+        return "unchanged", None
+    return "changed", (path, download)
+
+async def _apply_update(ctx, name: str, url: str, path: str, download):
+    """Завантажує новий файл у лоадер; при помилці повертає попередній файл."""
+    ok, msg = await ctx.engine.loader.load_file(path)
+
+    def finish():
         if ok:
-            repo_manager.record_install(target_name, dl_url)
-            await status.edit(f"✅ Installed <b>{target_name}</b> from <code>{repo_url}</code>")
-        else:
-            await status.edit(f"❌ Loading error: {msg}")
-            if os.path.exists(path):
-                os.remove(path)
-
-    # --- UPDATE ALL ---
-    elif subcmd == "update":
-        # Отримуємо список {plugin_name: source_url}
-        installed = repo_manager.get_all_installed()
-        
-        if not installed:
-            return await ctx.warn("No plugins installed via Package Manager.")
-        
-        status_msg = await ctx.respond(f"🔄 Checking updates for <b>{len(installed)}</b> plugins...")
-        
-        updated_count = 0
-        failed = []
-        
-        for name, url in installed.items():
+            if download.previous:
+                os.remove(download.previous)
+        elif download.previous:
+            # Стара версія лишилась у реєстрі — на диску теж має бути вона
+            os.replace(download.previous, path)
+        elif download.changed and os.path.exists(path):
+            # Нового плагіна не було до встановлення — не лишаємо битий файл
+            os.remove(path)
+
+    await asyncio.to_thread(finish)
+    if ok:
+        repo_manager.record_install(name, url, download.sha256)
+    return ok, msg
+
+@command("haruka update", timeout=900)
+async def haruka_update(ctx):
+    """
+    Check updates for all repo-installed plugins.
+    Usage: .haruka update
+    """
+    # Отримуємо список {plugin_name: {url, sha256}}
+    installed = repo_manager.get_all_installed()
+    
+    if not installed:
+        return await ctx.warn("No plugins installed via Package Manager.")
+    
+    status_msg = await ctx.respond(f"🔄 Checking updates for <b>{len(installed)}</b> plugins...")
+
+    # 1. Паралельно завантажуємо і порівнюємо хеші (без перезавантаження)
+    semaphore = asyncio.Semaphore(Config.REPO_SEARCH_CONCURRENCY)
+
+    async def check(name: str, record: dict):
+        async with semaphore:
             try:
-                # Завантажуємо нову версію
-                content = await repo_manager.fetch_file(url)
-                if not content:
-                    failed.append(f"{name} (Link invalid/404)")
-                    continue
-                
-                path = os.path.join(Config.PLUGINS_DIR, f"{name}.py")
-                
-                # Перезаписуємо
-                with open(path, "wb") as f:
-                    f.write(content)
-                
-                # Перезавантажуємо
-                ok, msg = await ctx.engine.loader.load_file(path)
-                if ok:
-                    updated_count += 1
-                else:
-                    failed.append(f"{name} (Load Error: {msg})")
-                    
+                return await _fetch_update(ctx, name, record, index_max_age=None)
             except Exception as e:
-                failed.append(f"{name} (Exception: {e})")
-                
-        # Формуємо звіт
-        text = f"📦 <b>Update finished</b>\n✅ Updated: <b>{updated_count}</b> plugins."
-        
-        if failed:
-            text += "\n\n❌ <b>Failures:</b>\n"
-            for f in failed:
-                text += f"• {f}\n"
-                
-        await status_msg.edit(text)
+                return "failed", f"exception: {e}"
 
-    else:
-        await ctx.err("Unknown subcommand. Usage: <code>.haruka [add|install|list|update]</code>")
\ No newline at end of file
+    # Індекси перевіряються один раз на репозиторій, а не на кожен плагін
+    await repo_manager.get_indexes(sorted({_update_repo(r["url"]) for r in installed.values()}), max_age=0)
+
+    names = sorted(installed)
+    results = await asyncio.gather(*(check(name, installed[name]) for name in names))
+
+    # 2. Перезавантажуємо лише змінені плагіни, по черзі
+    unchanged, updated, failed = [], [], []
+    for name, (state, detail) in zip(names, results):
+        if state == "unchanged":
+            unchanged.append(name)
+        elif state == "failed":
+            failed.append(f"{ctx.escape(name)} ({ctx.escape(detail)})")
+        else:
+            ok, msg = await _apply_update(ctx, name, installed[name]["url"], *detail)
+            if ok:
+                updated.append(name)
+            else:
+                failed.append(f"{ctx.escape(name)} (Load Error: {ctx.escape(msg)})")
+
+    # Формуємо звіт
+    text = (
+        f"📦 <b>Update finished</b>\n"
+        f"✅ Updated: <b>{len(updated)}</b>"
+        + (f" ({ctx.escape(', '.join(updated))})" if updated else "")
+        + f"\n💤 Unchanged: <b>{len(unchanged)}</b>"
+    )
+    
+    if failed:
+        text += "\n\n❌ <b>Failures:</b>\n"
+        for f in failed:
+            text += f"• {f}\n"
+            
+    await status_msg.edit(text, parse_mode="html")
@@ -0,0 +1,71 @@
+import os
+from system.decorators import command
+
+def _human_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+@command("backup", aliases=["dbbackup"])
+async def backup_db(ctx):
+    """
+    Creates an online snapshot of the database without stopping the bot.
+    Usage: .backup or .backup <path>
+    """
+    await ctx.warn("💾 Creating database backup...")
+
+    try:
+        stats = await ctx.engine.create_backup(ctx.input or None)
+    except Exception as e:
+        return await ctx.err(f"Backup failed: {e}")
+
+    await ctx.respond(
+        f"💾 <b>Backup created</b>\n"
+        f"┣ <b>File:</b> <code>{ctx.escape(os.path.basename(stats['path']))}</code>\n"
+        f"┣ <b>Size:</b> {_human_size(stats['size'])} ({stats['pages']} pages)\n"
+        f"┗ <b>Time:</b> {stats['seconds']:.2f}s"
+    )
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+@command("dbstats", aliases=["dbs"])
+async def db_stats(ctx):
+    """
+    Shows database operation timings (p50/p95/p99 in ms) and the slow-op log.
+    Usage: .dbstats or .dbstats reset
+    """
+    stats = ctx.engine.db.stats
+
+    if ctx.args and ctx.args[0].lower() == "reset":
+        stats.reset()
+        return await ctx.ok("Database statistics reset.")
+
+    summary = stats.summary()
+    if not summary:
+        return await ctx.warn("No database operations recorded yet.")
+
+    text = "📊 <b>Database timings</b> (ms, p50/p95/p99)\n━━━━━━━━━━━━━━━━━━━━\n"
+    for op, data in summary.items():
+        total = data["total"]
+        text += (
+            f"<b>{op}</b> ×{data['count']}"
+            + (f" ({data['errors']} err)" if data["errors"] else "")
+            + f": <code>{_ms(total['p50'])}/{_ms(total['p95'])}/{_ms(total['p99'])}</code>\n"
+        )
+        for phase, pcts in sorted(data["phases"].items()):
+            text += f"  ┗ {phase}: <code>{_ms(pcts['p50'])}/{_ms(pcts['p95'])}/{_ms(pcts['p99'])}</code>\n"
+
+    slow = list(stats.slow_log)[-5:]
+    text += f"\n🐢 <b>Slow ops</b> (≥ {_ms(stats.slow_threshold)}ms): {len(stats.slow_log)}\n"
+    for entry in reversed(slow):
+        lock = entry.phases.get("lock_wait", 0.0)
+        text += (
+            f"• <b>{entry.op}</b> {_ms(entry.total)}ms "
+            f"(lock {_ms(lock)}ms) key=<code>{ctx.escape(entry.key_prefix or '-')}</code> "
+            f"from <code>{ctx.escape(entry.caller)}</code>\n"
+        )
+
+    await ctx.respond(text)
\ No newline at end of file
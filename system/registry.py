@@ -1,11 +1,18 @@
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional, Set, Callable
+import unicodedata
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional, Set, Callable, Awaitable, FrozenSet, Mapping, Tuple
 from dataclasses import dataclass, field
+from .suggest import SuggestionIndex
 
 # Setup logger
 logger = logging.getLogger("Registry")
 
+def normalize_trigger(trigger: str) -> str:
+    """Lookup key of a trigger: casefolded, then NFKC ('Ｐｉｎｇ' -> 'ping')."""
+    return unicodedata.normalize("NFKC", trigger.casefold())
+
 @dataclass
 class CommandMeta:
     name: str
@@ -14,37 +21,158 @@ class CommandMeta:
     module_name: str = "" 
     aliases: List[str] = field(default_factory=list)
     flags: Dict[str, Any] = field(default_factory=dict)
+    # Docstring for .help (filled by the decorator or the lazy-load manifest)
+    doc: str = ""
+    # Normalized lookup key: "ping", or "haruka add" for a subcommand
+    key: str = field(init=False, default="")
 
     def __post_init__(self):
         # [Validation] Ensure basic integrity
         if not self.name:
             raise ValueError("Command name cannot be empty")
+        # "haruka  add" -> "haruka add"; one space separates command and subcommand
+        self.name = " ".join(self.name.split())
+        if self.name.count(" ") > 1:
+            raise ValueError(f"Command '{self.name}' is nested too deep (only 'command subcommand' is supported)")
+        self.key = normalize_trigger(self.name)
         if not callable(self.handler):
             # Для відладки корисно бачити, що саме передали замість функції
             raise TypeError(f"Handler for '{self.name}' must be callable, got {type(self.handler)}")
-        
-        # Fix: Ця перевірка видалена, оскільки Loader заповнює це поле ПІЗНІШЕ
-        # if not self.module_name:
-        #     raise ValueError(f"Module name is missing for command '{self.name}'")
+
+    @property
+    def parent(self) -> Optional[str]:
+        """Root command of a subcommand ('haruka add' -> 'haruka'), else None."""
+        return self.name.split(" ", 1)[0] if " " in self.name else None
+
+    @property
+    def triggers(self) -> List[str]:
+        """Name and aliases; subcommand aliases live under the same root."""
+        parent = self.parent
+        if parent is None:
+            return [self.name] + self.aliases
+        return [self.name] + [f"{parent} {alias}" for alias in self.aliases]
+
+_EMPTY = MappingProxyType({})
+
+def _build_groups(commands: Mapping[str, CommandMeta]) -> Mapping[str, Tuple[CommandMeta, ...]]:
+    """root key -> subcommands, built once per published snapshot."""
+    found: Dict[str, Dict[int, CommandMeta]] = {}
+    for key, meta in commands.items():
+        if " " in key:
+            found.setdefault(key.split(" ", 1)[0], {})[id(meta)] = meta
+    return MappingProxyType({
+        root: tuple(sorted(subs.values(), key=lambda m: m.name)) for root, subs in found.items()
+    })
+
+@dataclass(frozen=True)
+class RegistrySnapshot:
+    """
+    Immutable view of the registry. A new one is published on every change,
+    so readers holding a snapshot never see a half-applied update.
+    """
+    version: int
+    # Main dispatch table: normalized trigger (name/alias) -> CommandMeta
+    # Display names stay in CommandMeta.name / .aliases
+    commands: Mapping[str, CommandMeta]
+    # Stored module instances: module_name -> instance
+    modules: Mapping[str, Any]
+    # Reverse index for fast lookups/deletion: module_name -> triggers
+    module_index: Mapping[str, FrozenSet[str]]
+    # Commands each module currently owns (no alias duplicates), sorted by name
+    module_commands: Mapping[str, Tuple[CommandMeta, ...]]
+    # Normalized root key -> its subcommands (no alias duplicates), sorted by name
+    groups: Mapping[str, Tuple[CommandMeta, ...]] = field(default_factory=lambda: _EMPTY)
+
+    def subcommands(self, root_key: str) -> List[CommandMeta]:
+        """Subcommands of a root command, sorted by name."""
+        return list(self.groups.get(root_key, ()))
+
+def _group_command(root: str, module_name: str) -> CommandMeta:
+    """Implicit handler for a root that only has subcommands: shows their usage."""
+    root_key = normalize_trigger(root)
+
+    async def group_handler(ctx):
+        subs = ctx.engine.registry.snapshot.subcommands(root_key)
+        text = ""
+        if ctx.args:
+            text += f"❌ Unknown subcommand <b>{ctx.escape(ctx.args[0])}</b>\n\n"
+        text += f"📦 <b>{ctx.prefix}{root}</b>\n"
+        for sub in subs:
+            summary = sub.doc.strip().splitlines()[0] if sub.doc.strip() else ""
+            text += f"<code>{ctx.prefix}{sub.name}</code>" + (f" — {ctx.escape(summary)}" if summary else "") + "\n"
+        await ctx.respond(text)
+
+    return CommandMeta(
+        name=root,
+        handler=group_handler,
+        module_name=module_name,
+        flags={"group": True},
+        doc=f"Group of subcommands. Usage: .{root} <subcommand>",
+    )
 
 class Registry:
-    def __init__(self):
+    def __init__(self, on_remove: Optional[Callable[[str, Any], Awaitable[Any]]] = None):
+        # Serializes writers only; readers go through the published snapshot
         self._lock = asyncio.Lock()
-        
-        # Main dispatch table: trigger (name/alias) -> CommandMeta
-        self.commands: Dict[str, CommandMeta] = {}
-        
-        # Stored module instances: module_name -> instance
-        self.modules: Dict[str, Any] = {}
-        
-        # Reverse index for fast lookups/deletion: module_name -> Set[triggers]
-        # Solves Performance Issue #8 (Iterating whole dict)
-        self._module_index: Dict[str, Set[str]] = {}
+
+        # Teardown hook (Engine.teardown_module): called after a module is removed
+        self.on_remove = on_remove
+
+        # Copy-on-write: writers build new dicts and swap the reference (atomic in CPython)
+        self._snapshot = RegistrySnapshot(
+            version=0, commands=_EMPTY, modules=_EMPTY, module_index=_EMPTY, module_commands=_EMPTY
+        )
+
+        # "Did you mean" index over all triggers, kept in sync by _publish()
+        self.suggestions = SuggestionIndex()
+
+        # Rendered pages (e.g. .help): module_name -> text, None -> the overview page.
+        # Dropped per module by _publish(), so unchanged modules are never re-rendered.
+        self._pages: Dict[Optional[str], str] = {}
+
+    # --- Read API (lock-free, no copying) ---
+
+    @property
+    def snapshot(self) -> RegistrySnapshot:
+        """Current consistent view; keep a reference to read several fields together."""
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @property
+    def commands(self) -> Mapping[str, CommandMeta]:
+        return self._snapshot.commands
+
+    @property
+    def modules(self) -> Mapping[str, Any]:
+        return self._snapshot.modules
+
+    def get_command(self, trigger: str) -> Optional[CommandMeta]:
+        """Lock-free lookup in the current snapshot. `trigger` must be normalized."""
+        return self._snapshot.commands.get(trigger)
+
+    def get_all_commands(self) -> Mapping[str, CommandMeta]:
+        """Read-only dispatch table of the current snapshot (not a copy)."""
+        return self._snapshot.commands
+
+    def cached_page(self, module_name: Optional[str], render: Callable[[RegistrySnapshot], str]) -> str:
+        """
+        Returns the cached page of a module (None = overview of all modules),
+        rendering it from the current snapshot on a miss.
+        """
+        page = self._pages.get(module_name)
+        if page is None:
+            page = self._pages[module_name] = render(self._snapshot)
+        return page
+
+    # --- Write API ---
 
     async def register_module(self, module_name: str, module_inst: Any, commands: List[CommandMeta]) -> bool:
         """
         Registers a module and its commands safely.
-        Handles overwrites and updates internal indexes.
+        Handles overwrites and publishes a new snapshot.
         """
         # [Validation] Fail fast before acquiring lock
         if not module_name:
@@ -77,40 +205,98 @@ class Registry:
             logger.exception(f"Critical error registering '{module_name}': {e}")
             return False
 
+    def _draft(self):
+        """Mutable copies of the current snapshot for a writer (under lock)."""
+        snap = self._snapshot
+        return dict(snap.commands), dict(snap.modules), {k: set(v) for k, v in snap.module_index.items()}
+
+    def _publish(self, commands: Dict[str, CommandMeta], modules: Dict[str, Any],
+                 index: Dict[str, Set[str]], touched: Set[str]):
+        """Swaps in a new snapshot; `touched` are the modules whose commands changed."""
+        # Incremental: only triggers that appeared or disappeared touch the index
+        old = self._snapshot.commands.keys()
+        self.suggestions.update(added=commands.keys() - old, removed=old - commands.keys())
+
+        # Per-module command lists: rebuild only the touched modules
+        module_commands = dict(self._snapshot.module_commands)
+        for name in touched:
+            if name not in index:
+                module_commands.pop(name, None)
+                continue
+            owned = {id(meta): meta for t in index[name]
+                     if (meta := commands.get(t)) is not None and meta.module_name == name}
+            module_commands[name] = tuple(sorted(owned.values(), key=lambda m: m.name))
+
+        self._snapshot = RegistrySnapshot(
+            version=self._snapshot.version + 1,
+            commands=MappingProxyType(commands),
+            modules=MappingProxyType(modules),
+            module_index=MappingProxyType({k: frozenset(v) for k, v in index.items()}),
+            module_commands=MappingProxyType(module_commands),
+            groups=_build_groups(commands),
+        )
+
+        # Invalidate rendered pages of the touched modules and the overview
+        for name in touched:
+            self._pages.pop(name, None)
+        self._pages.pop(None, None)
+
     def _unsafe_register(self, module_name: str, module_inst: Any, commands: List[CommandMeta]) -> bool:
         """Internal synchronous registration logic (executed under lock)."""
-        
+        table, modules, index = self._draft()
+
         # 1. Cleanup old version of this module (Hot-reload support)
-        if module_name in self.modules:
+        if module_name in modules:
             logger.info(f"Reloading module '{module_name}'...")
-            self._unsafe_remove(module_name)
+            self._remove_from(table, modules, index, module_name)
 
         # 2. Register module instance
-        self.modules[module_name] = module_inst
-        self._module_index[module_name] = set()
+        modules[module_name] = module_inst
+        index[module_name] = set()
 
         count = 0
+        # Modules that lose triggers to this one need their command lists rebuilt
+        touched = {module_name}
+
+        # Subcommands without a declared root get an implicit group command
+        declared = {cmd.key for cmd in commands}
+        for root in sorted({cmd.parent for cmd in commands if cmd.parent}):
+            if normalize_trigger(root) not in declared:
+                commands = commands + [_group_command(root, module_name)]
+                declared.add(normalize_trigger(root))
         
         for cmd in commands:
-            # Collect all triggers (name + aliases)
-            triggers = [cmd.name] + cmd.aliases
+            # Collect all triggers (name + aliases), keyed by their normalized form
+            triggers = cmd.triggers
             
-            for trigger in triggers:
-                # [Conflict Detection] (Issue #1 & #6)
-                if trigger in self.commands:
-                    existing = self.commands[trigger]
+            for display in triggers:
+                trigger = normalize_trigger(display)
+                # [Conflict Detection] (Issue #1 & #6), on the normalized form:
+                # 'Ping' and 'ping' are the same trigger
+                if trigger in table:
+                    existing = table[trigger]
+                    if existing is cmd:
+                        continue
                     if existing.module_name != module_name:
+                        touched.add(existing.module_name)
                         logger.warning(
-                            f"Conflict: Module '{module_name}' is overwriting command/alias '{trigger}' "
+                            f"Conflict: Module '{module_name}' is overwriting command/alias '{display}' "
                             f"previously owned by '{existing.module_name}'"
                         )
+                    elif trigger in index[module_name]:
+                        logger.warning(
+                            f"Conflict: '{display}' in module '{module_name}' is declared twice "
+                            f"('{existing.name}' and '{cmd.name}'), the last one wins"
+                        )
 
                 # Update main table
-                self.commands[trigger] = cmd
+                table[trigger] = cmd
                 # Update reverse index
-                self._module_index[module_name].add(trigger)
+                index[module_name].add(trigger)
                 count += 1
 
+        # 3. Swap in the new snapshot in one step
+        self._publish(table, modules, index, touched)
         logger.info(f"Registered module '{module_name}' with {count} triggers.")
         return True
 
@@ -122,47 +308,50 @@ class Registry:
                     if module_name not in self.modules:
                         logger.warning(f"Attempted to remove non-existent module: '{module_name}'")
                         return False
-                    return self._unsafe_remove(module_name)
+                    module_inst = self.modules[module_name]
+                    removed = self._unsafe_remove(module_name)
         except asyncio.TimeoutError:
             logger.error(f"Timeout acquiring lock while removing '{module_name}'")
             return False
 
+        # Teardown outside the lock: unregister() hooks may be slow or touch the registry
+        if removed and self.on_remove:
+            try:
+                await self.on_remove(module_name, module_inst)
+            except Exception as e:
+                logger.error(f"Teardown of '{module_name}' failed: {e}")
+        return removed
+
     def _unsafe_remove(self, module_name: str) -> bool:
+        """Removes a module and publishes the new snapshot (under lock)."""
+        table, modules, index = self._draft()
+        self._remove_from(table, modules, index, module_name)
+        self._publish(table, modules, index, {module_name})
+        return True
+
+    def _remove_from(self, table: Dict[str, CommandMeta], modules: Dict[str, Any],
+                     index: Dict[str, Set[str]], module_name: str):
         """
-        Removes module commands using the reverse index.
+        Removes module commands from draft tables using the reverse index.
         CRITICAL: Checks ownership before deletion to avoid deleting overwritten aliases.
         """
         # Get list of triggers registered by this module
-        triggers = self._module_index.get(module_name, set())
+        triggers = index.get(module_name, set())
         
         removed_count = 0
         for trigger in triggers:
             # [Safety] Only delete if the command still belongs to this module
-            # If Module B overwrote this alias, self.commands[trigger].module_name would be 'Module B'
+            # If Module B overwrote this alias, table[trigger].module_name would be 'Module B'
             # We must NOT delete Module B's command when removing Module A. (Issue #2 & #7)
-            if trigger in self.commands:
-                if self.commands[trigger].module_name == module_name:
-                    del self.commands[trigger]
+            if trigger in table:
+                if table[trigger].module_name == module_name:
+                    del table[trigger]
                     removed_count += 1
                 else:
-                    logger.debug(f"Skipping removal of '{trigger}': ownership changed to '{self.commands[trigger].module_name}'")
+                    logger.debug(f"Skipping removal of '{trigger}': ownership changed to '{table[trigger].module_name}'")
 
         # Clean up indexes
-        if module_name in self.modules:
-            del self.modules[module_name]
-        if module_name in self._module_index:
-            del self._module_index[module_name]
+        modules.pop(module_name, None)
+        index.pop(module_name, None)
 
         logger.info(f"Removed module '{module_name}' ({removed_count} triggers cleaned).")
-        return True
-
-    async def get_command(self, trigger: str) -> Optional[CommandMeta]:
-        """Thread-safe lookup."""
-        # Dict lookup is atomic in Python, but lock ensures we don't read mid-update
-        # async with self._lock: # Optional: strict consistency
-        return self.commands.get(trigger)
-
-    async def get_all_commands(self) -> Dict[str, CommandMeta]:
-        """Returns a copy of commands."""
-        async with self._lock:
-            return self.commands.copy()
\ No newline at end of file
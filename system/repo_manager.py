@@ -1,19 +1,89 @@
 import os
 import json
-import aiohttp
+import time
+import hashlib
 import logging
+import secrets
+import tempfile
 import asyncio
-from typing import List, Dict, Optional
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, List, Dict, Optional, Tuple
 from urllib.parse import urlparse
 from system.config import Config
+from system.http_client import HttpClient
+
+if TYPE_CHECKING:
+    # aiohttp is heavy (~150 ms): HttpClient imports it on the first request
+    import aiohttp
 
 # Setup logger
 logger = logging.getLogger("RepoManager")
 
+# Optional per-repo plugin list, e.g.
+# {"plugins": {"cute": {"sha256": "...", "version": "1.2", "description": "..."}}}
+INDEX_FILE = "index.json"
+
+# Streaming chunk size for downloads
+CHUNK_SIZE = 64 * 1024
+# Seconds to coalesce state changes before haruka_repos.json is rewritten
+SAVE_DELAY = 1.0
+
+class DownloadError(Exception):
+    """Download failed: HTTP error, size cap exceeded or checksum mismatch."""
+
+@dataclass
+class Download:
+    sha256: str
+    size: int
+    # False: the destination already had exactly this content and was not touched
+    changed: bool
+    # Hard link/copy of the replaced file (keep_previous=True), for rollback
+    previous: Optional[str] = None
+
+def _file_sha256(path: str) -> Optional[str]:
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+def _keep_previous(path: str) -> Optional[str]:
+    """Preserves the current file next to it without moving it (dest never disappears)."""
+    if not os.path.exists(path):
+        return None
+    # Унікальне ім'я: паралельні завантаження того самого плагіна не затирають відкат одне одного
+    previous = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{secrets.token_hex(4)}.prev")
+    try:
+        os.link(path, previous)
+    except OSError:
+        import shutil
+        shutil.copy2(path, previous)
+    return previous
+
+def _is_sha256(value: Any) -> bool:
+    return isinstance(value, str) and len(value) == 64 and all(c in "0123456789abcdefABCDEF" for c in value)
+
+def _remove_quietly(path: Optional[str]):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
 class RepoManager:
     def __init__(self):
         self.db_path = os.path.join(Config.BASE_DIR, "haruka_repos.json")
-        self._session: Optional[aiohttp.ClientSession] = None
+        self.index_dir = os.path.join(Config.CACHE_DIR, "repo_index")
+        # Engine-owned client (attach), or a private one when used standalone
+        self.http: Optional[HttpClient] = None
+        self._own_http: Optional[HttpClient] = None
+        # repo -> {"etag", "last_modified", "checked_at", "plugins"}; plugins None = repo has no index
+        self._indexes: Dict[str, Dict[str, Any]] = {}
+        # repo -> in-flight revalidation, shared by concurrent callers
+        self._index_fetches: Dict[str, "asyncio.Task"] = {}
         
         # Структура даних в пам'яті
         self.data = {
@@ -23,13 +93,24 @@ class RepoManager:
             "installed": {} 
         }
         
-        # Завантажуємо дані одразу при старті (синхронно, щоб бути готовими до запитів)
-        self._load()
+        # Файл читається при першому зверненні, а не при імпорті модуля
+        self._loaded = False
+        # Відкладений запис: зміни за SAVE_DELAY зливаються в один запис файлу
+        self._dirty = False
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._save_task: Optional["asyncio.Task"] = None
+        self._save_lock = asyncio.Lock()
+
+    def _ensure_loaded(self):
+        """Ліниве завантаження бази (ніякого I/O під час імпорту)."""
+        if not self._loaded:
+            self._loaded = True
+            self._load()
 
     def _load(self):
         """Завантажує базу даних з диску."""
         if not os.path.exists(self.db_path):
-            self._save()
+            # Значення за замовчуванням; файл з'явиться з першою зміною
             return
 
         try:
@@ -42,19 +123,63 @@ class RepoManager:
             if os.path.exists(self.db_path):
                 os.rename(self.db_path, self.db_path + ".bak")
 
-    def _save(self):
-        """Зберігає базу даних на диск."""
+    def _write(self, payload: str):
+        """Атомарний запис: тимчасовий файл поруч + os.replace (без напівзаписаного JSON)."""
+        tmp = self.db_path + ".tmp"
         try:
-            with open(self.db_path, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, indent=4, ensure_ascii=False)
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.db_path)
         except Exception as e:
             logger.error(f"Failed to save repo DB: {e}")
 
-    async def get_session(self) -> aiohttp.ClientSession:
-        """Лінива ініціалізація сесії."""
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
-        return self._session
+    def _dump(self) -> str:
+        # Серіалізація — в потоці циклу, поки self.data ніхто не змінює
+        self._dirty = False
+        return json.dumps(self.data, ensure_ascii=False, separators=(",", ":"))
+
+    def _save(self):
+        """Позначає базу зміненою; запис на диск відкладається і робиться в потоці."""
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Поза event loop (скрипти, тести) — просто пишемо одразу
+            self._write(self._dump())
+            return
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(SAVE_DELAY, self._start_flush)
+
+    def _start_flush(self):
+        self._save_handle = None
+        self._save_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        """Записує відкладені зміни негайно (при вимкненні та вивантаженні packages)."""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        # Один запис за раз: зміни, зроблені під час запису, підхопить наступний
+        async with self._save_lock:
+            if self._dirty:
+                await asyncio.to_thread(self._write, self._dump())
+
+    def attach(self, http: HttpClient):
+        """Використовувати спільний HTTP-клієнт Engine (пул з'єднань, ретраї, метрики)."""
+        self.http = http
+
+    def _client(self) -> HttpClient:
+        if self.http is not None:
+            return self.http
+        if self._own_http is None:
+            self._own_http = HttpClient()
+        return self._own_http
+
+    async def get_session(self) -> "aiohttp.ClientSession":
+        """Сесія HTTP-клієнта (для сумісності)."""
+        return await self._client().session()
 
     def _normalize_url(self, url: str) -> str:
         """Перетворює посилання GitHub на Raw-посилання."""
@@ -88,6 +213,7 @@ class RepoManager:
 
     def get_all_repos(self) -> List[str]:
         """Повертає список репозиторіїв."""
+        self._ensure_loaded()
         return self.data.get("repos", [])
 
     def add_repo(self, url: str) -> bool:
@@ -96,6 +222,7 @@ class RepoManager:
         ПРИМІТКА: Метод синхронний, щоб працювати в packages.py без await.
         Валідація тут спрощена (тільки формат URL).
         """
+        self._ensure_loaded()
         norm_url = self._normalize_url(url)
         
         if norm_url in self.data["repos"]:
@@ -105,36 +232,59 @@ class RepoManager:
         self._save()
         return True
 
-    def record_install(self, name: str, url: str):
-        """Записує, звідки встановлено плагін."""
-        self.data["installed"][name] = url
+    def record_install(self, name: str, url: str, sha256: Optional[str] = None):
+        """Записує, звідки встановлено плагін, і SHA-256 встановленого вмісту."""
+        self._ensure_loaded()
+        self.data["installed"][name] = {"url": url, "sha256": sha256}
         self._save()
 
     def remove_install_record(self, name: str):
         """Видаляє запис про встановлення."""
+        self._ensure_loaded()
         if name in self.data["installed"]:
             del self.data["installed"][name]
             self._save()
 
+    @staticmethod
+    def _install_record(record: Any) -> Dict[str, Optional[str]]:
+        # Старий формат: просто URL рядком, без хешу
+        if isinstance(record, str):
+            return {"url": record, "sha256": None}
+        return {"url": record.get("url"), "sha256": record.get("sha256")}
+
+    def get_installed(self, name: str) -> Optional[Dict[str, Optional[str]]]:
+        """{url, sha256} для плагіна, встановленого з репозиторію."""
+        self._ensure_loaded()
+        record = self.data["installed"].get(name)
+        return self._install_record(record) if record else None
+
     def get_installed_url(self, name: str) -> Optional[str]:
         """Отримує URL оновлення для плагіна."""
-        return self.data["installed"].get(name)
+        record = self.get_installed(name)
+        return record["url"] if record else None
 
-    def get_all_installed(self) -> Dict[str, str]:
-        """Повертає всі встановлені через менеджер плагіни."""
-        return self.data.get("installed", {})
+    def get_all_installed(self) -> Dict[str, Dict[str, Optional[str]]]:
+        """Повертає всі встановлені через менеджер плагіни: name -> {url, sha256}."""
+        self._ensure_loaded()
+        return {name: self._install_record(r) for name, r in self.data.get("installed", {}).items()}
 
-    async def fetch_file(self, url: str) -> Optional[bytes]:
+    async def fetch_file(self, url: str, max_size: Optional[int] = None) -> Optional[bytes]:
         """
-        Завантажує файл (Асинхронно).
-        Використовується в: .haruka install / update
+        Завантажує файл у пам'ять (для невеликих файлів; не більше max_size).
+        Плагіни завантажуються через download() — потоково, одразу на диск.
         """
-        session = await self.get_session()
+        max_size = Config.MAX_PLUGIN_SIZE if max_size is None else max_size
         try:
-            # Timeout 10 секунд, щоб не вішати бота
-            async with session.get(url, timeout=10) as resp:
+            # Таймаути і ретраї — з налаштувань HttpClient
+            async with self._client().request("GET", url) as resp:
                 if resp.status == 200:
-                    return await resp.read()
+                    body = bytearray()
+                    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                        body += chunk
+                        if len(body) > max_size:
+                            logger.warning(f"Fetch aborted {url}: larger than {max_size} bytes")
+                            return None
+                    return bytes(body)
                 else:
                     logger.warning(f"Fetch failed {url}: Status {resp.status}")
                     return None
@@ -142,10 +292,242 @@ class RepoManager:
             logger.error(f"Fetch error {url}: {e}")
             return None
             
+    async def download(
+        self,
+        url: str,
+        dest: str,
+        expected_sha256: Optional[str] = None,
+        unchanged_sha256: Optional[str] = None,
+        keep_previous: bool = False,
+        max_size: Optional[int] = None,
+    ) -> Download:
+        """
+        Потоково завантажує url у dest: чанки пишуться у тимчасовий файл поруч
+        і хешуються на льоту, тож пам'ять не залежить від розміру файлу.
+        Файл підміняється атомарно (os.replace) лише якщо:
+          • розмір не перевищив max_size (Config.MAX_PLUGIN_SIZE),
+          • SHA-256 збігся з expected_sha256 (якщо задано, напр. з index.json),
+          • вміст відрізняється від unchanged_sha256 / поточного dest.
+        :raises DownloadError: HTTP-помилка, завеликий файл або невірний хеш
+        """
+        max_size = Config.MAX_PLUGIN_SIZE if max_size is None else max_size
+        if expected_sha256 is not None and not _is_sha256(expected_sha256):
+            raise DownloadError(f"invalid expected sha256: {expected_sha256!r}")
+        directory = os.path.dirname(os.path.abspath(dest))
+        tmp: Optional[str] = None
+        digest = hashlib.sha256()
+        size = 0
+
+        def create_tmp():
+            # Унікальний файл на кожне завантаження: два паралельні .haruka install/update
+            # одного плагіна інакше писали б в один .part і підміняли байти одне одного.
+            # Починається з "." — лоадер і вотчер такі файли ігнорують.
+            fd, name = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(dest)}.", suffix=".part")
+            # mkstemp створює 0600; плагін має звичайні права
+            os.chmod(name, 0o644)
+            return os.fdopen(fd, "wb"), name
+
+        try:
+            async with self._client().request("GET", url) as resp:
+                if resp.status != 200:
+                    raise DownloadError(f"HTTP {resp.status}")
+                if resp.content_length is not None and resp.content_length > max_size:
+                    raise DownloadError(f"file is {resp.content_length} bytes, limit is {max_size}")
+
+                f, tmp = await asyncio.to_thread(create_tmp)
+                try:
+                    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > max_size:
+                            raise DownloadError(f"file exceeds the {max_size} bytes limit")
+                        digest.update(chunk)
+                        # Диск може бути повільним — не блокуємо event loop
+                        await asyncio.to_thread(f.write, chunk)
+                finally:
+                    await asyncio.to_thread(f.close)
+        except DownloadError:
+            await asyncio.to_thread(_remove_quietly, tmp)
+            raise
+        except asyncio.CancelledError:
+            await asyncio.to_thread(_remove_quietly, tmp)
+            raise
+        except Exception as e:
+            await asyncio.to_thread(_remove_quietly, tmp)
+            raise DownloadError(f"{type(e).__name__}: {e}") from e
+
+        sha256 = digest.hexdigest()
+        if expected_sha256 and sha256 != expected_sha256.lower():
+            await asyncio.to_thread(_remove_quietly, tmp)
+            raise DownloadError("checksum does not match the repo index")
+
+        unchanged = os.path.exists(dest) and (
+            sha256 == unchanged_sha256 or sha256 == await asyncio.to_thread(_file_sha256, dest)
+        )
+        if unchanged:
+            await asyncio.to_thread(_remove_quietly, tmp)
+            return Download(sha256=sha256, size=size, changed=False)
+
+        def install() -> Optional[str]:
+            previous = _keep_previous(dest) if keep_previous else None
+            os.replace(tmp, dest)
+            return previous
+
+        previous = await asyncio.to_thread(install)
+        return Download(sha256=sha256, size=size, changed=True, previous=previous)
+
+    async def probe(self, url: str) -> Tuple[Optional[bool], float, str]:
+        """
+        Перевіряє наявність файлу без завантаження тіла.
+        HEAD, а якщо сервер його не підтримує — GET, з якого читається лише статус.
+        :return: (exists: True/False, None при помилці мережі; seconds; note)
+        """
+        http = self._client()
+        started = time.perf_counter()
+        try:
+            async with http.request("HEAD", url, allow_redirects=True) as resp:
+                status = resp.status
+            if status in (405, 501):
+                # Тіло не читаємо: відповідь закривається при виході з блоку
+                async with http.request("GET", url) as resp:
+                    status = resp.status
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Probe error {url}: {e}")
+            return None, time.perf_counter() - started, type(e).__name__
+        return status == 200, time.perf_counter() - started, str(status)
+
+    # --- Repository index (index.json) ---
+
+    def _index_cache_path(self, repo: str) -> str:
+        return os.path.join(self.index_dir, hashlib.sha1(repo.encode()).hexdigest()[:16] + ".json")
+
+    def _read_index_cache(self, repo: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._index_cache_path(repo), "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            return cached if cached.get("repo") == repo else None
+        except (OSError, ValueError):
+            return None
+
+    def _write_index_cache(self, repo: str, cached: Dict[str, Any]):
+        path = self._index_cache_path(repo)
+        tmp = f"{path}.tmp"
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(dict(cached, repo=repo), f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Failed to cache index of {repo}: {e}")
+
+    @staticmethod
+    def _parse_index(data: Any) -> Dict[str, Dict[str, Any]]:
+        """Accepts {"plugins": {name: {...}}} or {"plugins": [{"name": ..., ...}]}."""
+        plugins = data.get("plugins", {}) if isinstance(data, dict) else {}
+        if isinstance(plugins, list):
+            plugins = {p["name"]: p for p in plugins if isinstance(p, dict) and p.get("name")}
+        result = {}
+        for name, entry in plugins.items():
+            if not isinstance(entry, dict):
+                continue
+            name = str(name)
+            if name.endswith(".py"):
+                name = name[:-3]
+            # index.json приходить з мережі: лише очікувані поля і типи
+            clean: Dict[str, Any] = {"file": str(entry.get("file") or f"{name}.py")}
+            for field in ("version", "description"):
+                if entry.get(field) is not None:
+                    clean[field] = str(entry[field])
+            if _is_sha256(entry.get("sha256")):
+                clean["sha256"] = entry["sha256"].lower()
+            elif entry.get("sha256") is not None:
+                logger.warning(f"Ignoring invalid sha256 for '{name}' in index")
+            result[name] = clean
+        return result
+
+    async def get_index(self, repo: str, max_age: Optional[float] = None) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Plugins listed in the repo's index.json (name -> entry), or None if it has none.
+        Cached in memory and on disk; after `max_age` seconds the cache is revalidated
+        with If-None-Match / If-Modified-Since, so an unchanged index costs a 304.
+        """
+        max_age = Config.REPO_INDEX_TTL if max_age is None else max_age
+        cached = self._indexes.get(repo)
+        if cached is None:
+            cached = await asyncio.to_thread(self._read_index_cache, repo)
+            if cached is not None:
+                self._indexes[repo] = cached
+
+        if cached is not None and time.time() - cached.get("checked_at", 0) < max_age:
+            return cached["plugins"]
+
+        # One request per repo even when update-all asks for it from many plugins at once
+        task = self._index_fetches.get(repo)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh_index(repo, cached))
+            self._index_fetches[repo] = task
+            task.add_done_callback(lambda _: self._index_fetches.pop(repo, None))
+        return await asyncio.shield(task)
+
+    async def _refresh_index(self, repo: str, cached: Optional[Dict[str, Any]]) -> Optional[Dict[str, Dict[str, Any]]]:
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        url = f"{repo.rstrip('/')}/{INDEX_FILE}"
+        try:
+            async with self._client().request("GET", url, headers=headers) as resp:
+                if resp.status == 304 and cached is not None:
+                    fresh = dict(cached, checked_at=time.time())
+                elif resp.status == 200:
+                    data = json.loads(await resp.read())
+                    fresh = {
+                        "etag": resp.headers.get("ETag"),
+                        "last_modified": resp.headers.get("Last-Modified"),
+                        "checked_at": time.time(),
+                        "plugins": self._parse_index(data),
+                    }
+                elif resp.status in (404, 410):
+                    # No index: remember that too, so the repo is not asked again until max_age
+                    fresh = {"etag": None, "last_modified": None, "checked_at": time.time(), "plugins": None}
+                else:
+                    raise RuntimeError(f"status {resp.status}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Network or format problem: a stale index is better than none
+            logger.warning(f"Index of {repo} unavailable ({e}), using {'stale cache' if cached else 'probing'}")
+            return cached["plugins"] if cached else None
+
+        self._indexes[repo] = fresh
+        await asyncio.to_thread(self._write_index_cache, repo, fresh)
+        return fresh["plugins"]
+
+    async def get_indexes(self, repos: List[str], max_age: Optional[float] = None) -> Dict[str, Optional[Dict[str, Dict[str, Any]]]]:
+        """get_index() for several repos concurrently (bounded by REPO_SEARCH_CONCURRENCY)."""
+        semaphore = asyncio.Semaphore(Config.REPO_SEARCH_CONCURRENCY)
+
+        async def one(repo: str):
+            async with semaphore:
+                return await self.get_index(repo, max_age)
+
+        return dict(zip(repos, await asyncio.gather(*(one(r) for r in repos))))
+
+    @staticmethod
+    def plugin_url(repo: str, name: str, entry: Optional[Dict[str, Any]] = None) -> str:
+        filename = entry["file"] if entry else f"{name}.py"
+        return f"{repo.rstrip('/')}/{filename}"
+
     async def close(self):
-        """Закриває сесію при вимкненні бота."""
-        if self._session:
-            await self._session.close()
+        """Зберігає відкладені зміни і закриває сесію при вимкненні бота."""
+        await self.flush()
+        # Спільний клієнт закриває Engine
+        if self._own_http:
+            await self._own_http.close()
+            self._own_http = None
 
-# Singleton instance
+# Singleton instance (cheap: no I/O until first use)
 repo_manager = RepoManager()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import os
+import sys
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+logger = logging.getLogger("Scope")
+
+# Scope of the module whose code is running right now (register(), command handlers).
+# Tasks inherit it; the engine tracks those running the module's own coroutines.
+current_scope: ContextVar[Optional["ModuleScope"]] = ContextVar("haruka_module_scope", default=None)
+
+class ModuleScope:
+    """
+    Records what a module acquired at runtime (event handlers, tasks, scheduled
+    jobs) so it can be released when the module is reloaded or removed.
+    """
+
+    def __init__(self, name: str, client):
+        self.name = name
+        self.client = client
+        self.handlers: List[Tuple[Callable, Any]] = []
+        self.tasks: Set[asyncio.Task] = set()
+        self.jobs: Set[asyncio.TimerHandle] = set()
+        self._file: Optional[str] = None
+
+    @contextmanager
+    def activate(self):
+        token = current_scope.set(self)
+        try:
+            yield self
+        finally:
+            current_scope.reset(token)
+
+    # --- tracking ---
+
+    def add_handler(self, callback: Callable, event: Any):
+        self.handlers.append((callback, event))
+
+    def track_task(self, task: asyncio.Task):
+        if task in self.tasks:
+            return
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def create_task(self, coro, name: str = None) -> asyncio.Task:
+        """asyncio.create_task that is cancelled with the module."""
+        with self.activate():
+            task = asyncio.get_running_loop().create_task(coro, name=name)
+        self.track_task(task)
+        return task
+
+    def owns(self, coro) -> bool:
+        """
+        True if the coroutine is defined in the module's own file.
+        Library tasks started from module code (e.g. Telethon's sender loops
+        when a command downloads media) are shared and must survive a reload.
+        """
+        code = getattr(coro, "cr_code", None)
+        if code is None:
+            return False
+        if self._file is None:
+            module_file = getattr(sys.modules.get(self.name), "__file__", None)
+            if not module_file:
+                return False
+            self._file = os.path.abspath(module_file)
+        return os.path.abspath(code.co_filename) == self._file
+
+    def call_later(self, delay: float, callback: Callable, *args) -> asyncio.TimerHandle:
+        """loop.call_later that is cancelled with the module."""
+        def run():
+            self.jobs.discard(handle)
+            with self.activate():
+                callback(*args)
+
+        handle = asyncio.get_running_loop().call_later(delay, run)
+        self.jobs.add(handle)
+        return handle
+
+    def every(self, interval: float, job: Callable[[], Any], name: str = None) -> asyncio.Task:
+        """Runs an async job every `interval` seconds until the module goes away."""
+        async def loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await job()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Scheduled job in '{self.name}' failed: {e}", exc_info=True)
+
+        return self.create_task(loop(), name=name)
+
+    # --- teardown ---
+
+    async def close(self, timeout: float = 5.0) -> Tuple[int, int, int]:
+        """
+        Removes handlers, cancels jobs and tasks.
+        :return: (handlers, tasks, jobs) released
+        """
+        removed = 0
+        for callback, event in self.handlers:
+            try:
+                removed += self.client.remove_event_handler(callback, event) or 0
+            except Exception as e:
+                logger.error(f"Failed to remove handler of '{self.name}': {e}")
+        self.handlers.clear()
+
+        jobs = len(self.jobs)
+        for handle in self.jobs:
+            handle.cancel()
+        self.jobs.clear()
+
+        # Never cancel the task doing the teardown (e.g. a module removing itself)
+        current = asyncio.current_task()
+        tasks = [t for t in self.tasks if t is not current and not t.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        self.tasks.clear()
+
+        return removed, len(tasks), jobs
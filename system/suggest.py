@@ -0,0 +1,92 @@
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Set
+
+def _grams(word: str) -> FrozenSet[str]:
+    """Padded bigrams: 'ping' -> {'^p', 'pi', 'in', 'ng', 'g$'}."""
+    padded = f"^{word}$"
+    return frozenset(padded[i:i + 2] for i in range(len(padded) - 1))
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein + adjacent transpositions).
+    Stops early and returns limit + 1 once the distance exceeds `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    prev_prev: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        row = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                row[j] = min(row[j], prev_prev[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        prev_prev, prev = prev, row
+    return prev[-1]
+
+class SuggestionIndex:
+    """
+    N-gram inverted index over command triggers, updated incrementally by the
+    registry. Bigrams rather than trigrams: most triggers are 2-6 characters
+    and a single typo destroys nearly every trigram of such a short word.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = {}
+        self._grams: Dict[str, FrozenSet[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def add(self, word: str):
+        if word in self._grams:
+            return
+        grams = _grams(word)
+        self._grams[word] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(word)
+
+    def discard(self, word: str):
+        grams = self._grams.pop(word, None)
+        if grams is None:
+            return
+        for gram in grams:
+            words = self._postings.get(gram)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self._postings[gram]
+
+    def update(self, added: Iterable[str], removed: Iterable[str]):
+        for word in removed:
+            self.discard(word)
+        for word in added:
+            self.add(word)
+
+    def suggest(self, query: str, limit: int = 3, candidates: int = 20) -> List[str]:
+        """
+        Closest triggers to `query`, best first.
+        Only the `candidates` words sharing the most n-grams are checked by edit
+        distance, and a match may differ by at most 1 edit per 3 characters.
+        """
+        if not query or query in self._grams:
+            return []
+
+        shared = Counter()
+        for gram in _grams(query):
+            for word in self._postings.get(gram, ()):
+                shared[word] += 1
+
+        max_distance = max(1, len(query) // 3)
+        ranked = []
+        for word, _ in shared.most_common(candidates):
+            distance = edit_distance(query, word, max_distance)
+            if distance <= max_distance:
+                ranked.append((distance, -shared[word], word))
+
+        ranked.sort()
+        return [word for _, _, word in ranked[:limit]]
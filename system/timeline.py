@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+@dataclass
+class Span:
+    name: str
+    cat: str
+    start: float      # seconds since the timeline origin
+    duration: float
+    tid: int
+    args: Dict[str, Any] = field(default_factory=dict)
+
+class Timeline:
+    """
+    Startup profiler: named spans per phase and per module,
+    exportable as Chrome trace-event JSON (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self.finished_at: Optional[float] = None
+
+    def add(self, name: str, cat: str, start: float, end: float, tid: int = None, **args):
+        """Records a span measured elsewhere (perf_counter values). Thread-safe."""
+        # Startup only: later hot reloads must not grow the timeline forever
+        if self.finished_at is not None:
+            return
+        self.spans.append(Span(
+            name=name,
+            cat=cat,
+            start=start - self.origin,
+            duration=end - start,
+            tid=tid if tid is not None else threading.get_ident(),
+            args=args
+        ))
+
+    @contextmanager
+    def span(self, name: str, cat: str = "phase", **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, cat, start, time.perf_counter(), **args)
+
+    def finish(self):
+        self.finished_at = time.perf_counter() - self.origin
+
+    @property
+    def total(self) -> float:
+        return self.finished_at if self.finished_at is not None else time.perf_counter() - self.origin
+
+    def phases(self) -> List[Span]:
+        return [s for s in self.spans if s.cat == "phase"]
+
+    def modules(self) -> List[Dict[str, Any]]:
+        """Per-module totals, slowest first: {name, total, <cat>: seconds...}"""
+        per_module: Dict[str, Dict[str, Any]] = {}
+        for s in self.spans:
+            if s.cat == "phase":
+                continue
+            entry = per_module.setdefault(s.name, {"name": s.name, "total": 0.0})
+            entry[s.cat] = entry.get(s.cat, 0.0) + s.duration
+            entry["total"] += s.duration
+        return sorted(per_module.values(), key=lambda e: e["total"], reverse=True)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": s.name,
+                    "cat": s.cat,
+                    "ph": "X",
+                    "ts": round(s.start * 1_000_000),
+                    "dur": round(s.duration * 1_000_000),
+                    "pid": pid,
+                    "tid": s.tid,
+                    "args": s.args,
+                }
+                for s in self.spans
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def write_chrome_trace(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
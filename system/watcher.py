@@ -0,0 +1,184 @@
+import os
+import sys
+import errno
+import struct
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import asyncio
+from typing import Dict, Optional, Set, Tuple
+from .config import Config
+
+logger = logging.getLogger("Watcher")
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+_EVENT_HEADER = struct.Struct("iIII")
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+
+def _file_digest(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+class PluginWatcher:
+    """
+    Hot-reloads plugins when their files change.
+    Uses inotify on Linux and falls back to polling elsewhere. Bursts of events
+    are debounced, and a file is reloaded only if its content hash changed.
+    """
+
+    def __init__(self, engine, directory: str = None, debounce: float = 0.5, poll_interval: float = 2.0):
+        self.engine = engine
+        self.directory = directory or Config.PLUGINS_DIR
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+
+        self._pending: Set[str] = set()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+        self._fd: Optional[int] = None
+        self._poll_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _is_plugin(filename: str) -> bool:
+        return filename.endswith(".py") and not filename.startswith(".") and not filename.startswith("__")
+
+    async def start(self):
+        if not os.path.isdir(self.directory):
+            logger.warning(f"Watcher disabled: {self.directory} does not exist")
+            return
+
+        if self._start_inotify():
+            logger.info(f"Watching {self.directory} (inotify)")
+        else:
+            self._poll_task = asyncio.create_task(self._poll_loop())
+            logger.info(f"Watching {self.directory} (polling every {self.poll_interval}s)")
+
+    async def stop(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._fd is not None:
+            asyncio.get_running_loop().remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+        if self._poll_task:
+            self._poll_task.cancel()
+            self._poll_task = None
+        for task in list(self._tasks):
+            task.cancel()
+
+    # --- inotify backend ---
+
+    def _start_inotify(self) -> bool:
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            if libc.inotify_add_watch(fd, os.fsencode(self.directory), _WATCH_MASK) < 0:
+                err = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(err, "inotify_add_watch failed")
+        except (OSError, AttributeError) as e:
+            logger.debug(f"inotify unavailable: {e}")
+            return False
+
+        self._fd = fd
+        asyncio.get_running_loop().add_reader(fd, self._on_inotify)
+        return True
+
+    def _on_inotify(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                logger.error(f"inotify read failed: {e}")
+            return
+
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _wd, _mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            if self._is_plugin(name):
+                self._schedule(name)
+
+    # --- polling backend ---
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        result = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if self._is_plugin(entry.name) and entry.is_file():
+                        st = entry.stat()
+                        result[entry.name] = (st.st_mtime_ns, st.st_size)
+        except OSError as e:
+            logger.error(f"Failed to scan {self.directory}: {e}")
+        return result
+
+    async def _poll_loop(self):
+        previous = await asyncio.to_thread(self._snapshot)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = await asyncio.to_thread(self._snapshot)
+            for name in set(previous) | set(current):
+                if previous.get(name) != current.get(name):
+                    self._schedule(name)
+            previous = current
+
+    # --- debounce + reload ---
+
+    def _schedule(self, filename: str):
+        self._pending.add(filename)
+        if self._timer:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(self.debounce, self._start_flush)
+
+    def _start_flush(self):
+        self._timer = None
+        task = asyncio.create_task(self._flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self):
+        async with self._flush_lock:
+            batch, self._pending = sorted(self._pending), set()
+            loader = self.engine.loader
+            registry = self.engine.registry
+
+            for filename in batch:
+                path = os.path.join(self.directory, filename)
+                module_name = loader._module_name(path)
+
+                digest = await asyncio.to_thread(_file_digest, path)
+                if digest is None:
+                    # File is gone: unregister its commands
+                    if module_name in registry.modules:
+                        await registry.remove_module(module_name)
+                        loader.hashes.pop(module_name, None)
+                        logger.info(f"🗑 {filename} deleted, module unloaded")
+                    continue
+
+                if digest == loader.hashes.get(module_name):
+                    continue
+
+                ok, msg = await loader.load_file(path)
+                if ok:
+                    logger.info(f"🔄 {filename} changed, reloaded ({msg})")
+                else:
+                    logger.error(f"❌ {filename} changed, reload failed: {msg}")
@@ -0,0 +1,256 @@
+"""
+Repo manager and package manager against a local aiohttp server:
+index.json revalidation (304), streaming download size cap and checksum,
+the haruka update unchanged/updated/failed split, debounced state saves.
+
+Run: python -m pytest tests  (or: python -m unittest discover tests)
+"""
+import os
+import sys
+import json
+import asyncio
+import hashlib
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from system.config import Config
+from system.context import Context
+import system.repo_manager as repo_module
+from system.repo_manager import RepoManager, DownloadError
+import system.modules.packages as packages
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+class RepoServer:
+    """Static plugin repo: /repo/<file>, index.json with an ETag."""
+
+    def __init__(self):
+        self.files = {}
+        self.index = None
+        self.log = []  # (path, status)
+
+    async def handle(self, request):
+        name = request.match_info["name"]
+        if name == "index.json" and self.index is not None:
+            body = json.dumps(self.index).encode()
+            etag = f'"{sha256(body)[:16]}"'
+            if request.headers.get("If-None-Match") == etag:
+                self.log.append((name, 304))
+                return web.Response(status=304, headers={"ETag": etag})
+            self.log.append((name, 200))
+            return web.Response(body=body, content_type="application/json", headers={"ETag": etag})
+        if name not in self.files:
+            self.log.append((name, 404))
+            return web.Response(status=404)
+        self.log.append((name, 200))
+        return web.Response(body=self.files[name])
+
+class FakeLoader:
+    def __init__(self):
+        self.hashes = {}
+        self.loaded = []
+
+    async def load_file(self, path):
+        with open(path, "rb") as f:
+            source = f.read()
+        try:
+            compile(source, path, "exec")
+        except SyntaxError as e:
+            return False, str(e)
+        self.loaded.append(os.path.basename(path))
+        return True, "ok"
+
+class FakeMessage:
+    def __init__(self):
+        self.edits = []
+
+    async def edit(self, text, **kwargs):
+        self.edits.append((text, kwargs))
+
+class FakeEngine:
+    def __init__(self):
+        self.loader = FakeLoader()
+
+class FakeCtx:
+    escape = staticmethod(Context.escape)
+
+    def __init__(self, engine, args=()):
+        self.engine = engine
+        self.args = list(args)
+        self.input = " ".join(args)
+        self.messages = []
+        self.results = []
+
+    async def respond(self, text, **kwargs):
+        message = FakeMessage()
+        self.messages.append((text, message))
+        return message
+
+    async def ok(self, text):
+        self.results.append(("ok", text))
+
+    async def err(self, text):
+        self.results.append(("err", text))
+
+    async def warn(self, text):
+        self.results.append(("warn", text))
+
+class RepoTestCase(unittest.IsolatedAsyncioTestCase):
+    CONFIG = ("BASE_DIR", "CACHE_DIR", "PLUGINS_DIR", "MAX_PLUGIN_SIZE", "REPO_INDEX_TTL")
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="haruka-test-")
+        self.saved = {name: getattr(Config, name) for name in self.CONFIG}
+        Config.BASE_DIR = self.tmp
+        Config.CACHE_DIR = os.path.join(self.tmp, "cache")
+        Config.PLUGINS_DIR = os.path.join(self.tmp, "plugins")
+        Config.REPO_INDEX_TTL = 300
+        os.makedirs(Config.PLUGINS_DIR)
+
+        self.repo = RepoServer()
+        app = web.Application()
+        app.router.add_get("/repo/{name}", self.repo.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.base = str(self.server.make_url("/repo")).rstrip("/")
+
+        self.rm = RepoManager()
+        self.rm._loaded = True
+        self.rm.data["repos"] = [self.base]
+        self.saved_rm = packages.repo_manager
+        packages.repo_manager = self.rm
+
+    async def asyncTearDown(self):
+        packages.repo_manager = self.saved_rm
+        await self.rm.close()
+        await self.server.close()
+        for name, value in self.saved.items():
+            setattr(Config, name, value)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def plugin_path(self, name: str) -> str:
+        return os.path.join(Config.PLUGINS_DIR, f"{name}.py")
+
+    def plugin_files(self):
+        return sorted(os.listdir(Config.PLUGINS_DIR))
+
+class IndexTests(RepoTestCase):
+    async def test_cached_then_revalidated_with_304(self):
+        self.repo.index = {"plugins": {"cute": {"sha256": sha256(b"x = 1"), "version": 2}}}
+
+        first = await self.rm.get_index(self.base)
+        self.assertEqual(first["cute"]["version"], "2")
+        # Within the TTL: no request at all
+        await self.rm.get_index(self.base)
+        self.assertEqual(self.repo.log, [("index.json", 200)])
+
+        # max_age=0: conditional GET, unchanged index answers 304
+        self.assertEqual(await self.rm.get_index(self.base, max_age=0), first)
+        self.assertEqual(self.repo.log[-1], ("index.json", 304))
+
+        self.repo.index["plugins"]["new"] = {}
+        self.assertIn("new", await self.rm.get_index(self.base, max_age=0))
+        self.assertEqual(self.repo.log[-1], ("index.json", 200))
+
+    async def test_invalid_digest_is_dropped(self):
+        self.repo.index = {"plugins": {"bad": {"sha256": 5}, "short": {"sha256": "abc"}}}
+        index = await self.rm.get_index(self.base)
+        self.assertNotIn("sha256", index["bad"])
+        self.assertNotIn("sha256", index["short"])
+
+class DownloadTests(RepoTestCase):
+    async def test_size_cap(self):
+        self.repo.files["big.py"] = b"#" * 1000
+        with self.assertRaises(DownloadError):
+            await self.rm.download(f"{self.base}/big.py", self.plugin_path("big"), max_size=100)
+        self.assertEqual(self.plugin_files(), [])
+
+    async def test_checksum_mismatch_keeps_old_file(self):
+        with open(self.plugin_path("a"), "wb") as f:
+            f.write(b"old = 1")
+        self.repo.files["a.py"] = b"new = 1"
+
+        with self.assertRaises(DownloadError):
+            await self.rm.download(f"{self.base}/a.py", self.plugin_path("a"), expected_sha256="0" * 64)
+        with open(self.plugin_path("a"), "rb") as f:
+            self.assertEqual(f.read(), b"old = 1")
+        self.assertEqual(self.plugin_files(), ["a.py"])
+
+    async def test_checksum_match_and_unchanged(self):
+        self.repo.files["a.py"] = b"a = 1"
+        result = await self.rm.download(f"{self.base}/a.py", self.plugin_path("a"), expected_sha256=sha256(b"a = 1"))
+        self.assertTrue(result.changed)
+        self.assertEqual(result.sha256, sha256(b"a = 1"))
+
+        again = await self.rm.download(f"{self.base}/a.py", self.plugin_path("a"))
+        self.assertFalse(again.changed)
+        self.assertEqual(self.plugin_files(), ["a.py"])
+
+class UpdateAllTests(RepoTestCase):
+    async def test_unchanged_updated_failed(self):
+        sources = {"same": b"same = 1", "changed": b"changed = 1", "broken": b"broken = 1"}
+        for name, source in sources.items():
+            with open(self.plugin_path(name), "wb") as f:
+                f.write(source)
+            self.rm.record_install(name, f"{self.base}/{name}.py", sha256(source))
+        self.rm.record_install("gone", f"{self.base}/gone.py")
+
+        self.repo.files.update({
+            "same.py": b"same = 1",
+            "changed.py": b"changed = 2",
+            "broken.py": b"broken = (",
+        })
+
+        ctx = FakeCtx(FakeEngine())
+        await packages.haruka_update(ctx)
+
+        text, kwargs = ctx.messages[-1][1].edits[-1]
+        self.assertEqual(kwargs.get("parse_mode"), "html")
+        self.assertIn("Updated: <b>1</b> (changed)", text)
+        self.assertIn("Unchanged: <b>1</b>", text)
+        self.assertIn("gone (HTTP 404)", text)
+        self.assertIn("broken (Load Error:", text)
+
+        with open(self.plugin_path("changed"), "rb") as f:
+            self.assertEqual(f.read(), b"changed = 2")
+        # Failed load rolls back to the previous file
+        with open(self.plugin_path("broken"), "rb") as f:
+            self.assertEqual(f.read(), b"broken = 1")
+        self.assertEqual(ctx.engine.loader.loaded, ["changed.py"])
+        self.assertEqual(self.rm.get_installed("changed")["sha256"], sha256(b"changed = 2"))
+        self.assertEqual(self.plugin_files(), ["broken.py", "changed.py", "same.py"])
+
+class SaveTests(RepoTestCase):
+    async def test_saves_are_debounced(self):
+        saved_delay = repo_module.SAVE_DELAY
+        repo_module.SAVE_DELAY = 0.05
+        writes = []
+        write = self.rm._write
+        self.rm._write = lambda payload: (writes.append(payload), write(payload))
+        try:
+            for i in range(20):
+                self.rm.record_install(f"p{i}", f"{self.base}/p{i}.py")
+            self.assertEqual(writes, [])
+
+            await asyncio.sleep(0.2)
+            self.assertEqual(len(writes), 1)
+            with open(self.rm.db_path, encoding="utf-8") as f:
+                self.assertEqual(len(json.load(f)["installed"]), 20)
+
+            # flush() writes pending changes right away
+            self.rm.remove_install_record("p0")
+            await self.rm.flush()
+            self.assertEqual(len(writes), 2)
+            self.assertFalse(os.path.exists(self.rm.db_path + ".tmp"))
+        finally:
+            repo_module.SAVE_DELAY = saved_delay
+
+if __name__ == "__main__":
+    unittest.main()
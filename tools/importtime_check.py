@@ -0,0 +1,92 @@
+"""
+Import-time regression check.
+
+Imports each target in a fresh interpreter with `python -X importtime` and fails if
+  • a module that must stay lazy (aiohttp, jinja2, ...) shows up in its import tree, or
+  • the cumulative import time of the target exceeds its budget.
+
+Usage:
+    python tools/importtime_check.py            # default targets
+    python tools/importtime_check.py --scale 2  # slower machine / CI: double every budget
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# target -> (budget in ms, modules that must not be imported by it)
+# Budgets include stdlib (asyncio alone is ~40 ms cold), so they are loose;
+# the forbidden lists are the strict part of the check.
+TARGETS: Dict[str, Tuple[float, List[str]]] = {
+    "system.modules.packages": (150, ["aiohttp", "jinja2", "aiohttp_jinja2", "telethon"]),
+    "system.repo_manager": (120, ["aiohttp", "jinja2"]),
+    "system.loader": (150, ["aiohttp", "jinja2"]),
+    "system.database": (200, ["aiohttp", "jinja2", "telethon"]),
+}
+
+# "import time: self [us] | cumulative | imported package"
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+def measure(target: str) -> Dict[str, int]:
+    """Cumulative import time (µs) of every module imported by `import target`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{result.stderr.strip()}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+    return modules
+
+def check(target: str, budget_ms: float, forbidden: List[str]) -> List[str]:
+    modules = measure(target)
+    problems = []
+
+    for name in forbidden:
+        hits = [m for m in modules if m == name or m.startswith(name + ".")]
+        if hits:
+            problems.append(f"{target} imports '{name}' eagerly ({len(hits)} modules)")
+
+    took_ms = modules.get(target, 0) / 1000
+    status = "ok" if took_ms <= budget_ms else "SLOW"
+    print(f"{status:>4}  {target:<28} {took_ms:7.1f} ms  (budget {budget_ms:.0f} ms)")
+    if took_ms > budget_ms:
+        problems.append(f"{target} took {took_ms:.1f} ms, budget is {budget_ms:.0f} ms")
+    return problems
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", help="modules to check (default: all known targets)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget by this factor")
+    args = parser.parse_args()
+
+    problems = []
+    for target in args.targets or TARGETS:
+        budget, forbidden = TARGETS.get(target, (100, ["aiohttp", "jinja2"]))
+        try:
+            problems += check(target, budget * args.scale, forbidden)
+        except RuntimeError as e:
+            problems.append(str(e))
+
+    if problems:
+        print("\n❌ Import-time regressions:")
+        for problem in problems:
+            print(f"  • {problem}")
+        return 1
+
+    print("\n✅ Imports are within budget.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())